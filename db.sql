@@ -46,7 +46,9 @@ CREATE TABLE IF NOT EXISTS `session` (
   `last_update` datetime DEFAULT NULL,
   `error` datetime DEFAULT NULL,
   `ended` datetime DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `session_user_active` (`user_id`, `ended`, `error`),
+  KEY `session_service_graph_active` (`service_graph_id`, `ended`, `error`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
 -- --------------------------------------------------------
@@ -62,7 +64,8 @@ CREATE TABLE IF NOT EXISTS `user` (
   `tenant_id` varchar(64) CHARACTER SET utf8 NOT NULL,
   `mail` varchar(64) CHARACTER SET utf8 DEFAULT NULL,
   `service_graph` text NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `user_name` (`name`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
 -- --------------------------------------------------------
@@ -89,7 +92,8 @@ CREATE TABLE IF NOT EXISTS `vnf_image` (
   `internal_id` varchar(255) NOT NULL,
   `template` text NOT NULL,
   `configuration_model` text,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `vnf_image_internal_id` (`internal_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
 -- --------------------------------------------------------
@@ -103,7 +107,8 @@ CREATE TABLE IF NOT EXISTS `user_device` (
   `mac_address` varchar(64) NOT NULL,
   `endpoint_id` varchar(64) NOT NULL,
   `endpoint_db_id` varchar(64) NOT NULL,
-  PRIMARY KEY (`session_id`, `mac_address`)
+  PRIMARY KEY (`session_id`, `mac_address`),
+  KEY `user_device_end_point` (`endpoint_db_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
 -- --------------------------------------------------------
@@ -125,10 +130,11 @@ CREATE TABLE IF NOT EXISTS `user_location` (
 --
 
 CREATE TABLE IF NOT EXISTS `domain` (
-  `id` int(11) NOT NULL,
+  `id` int(11) NOT NULL AUTO_INCREMENT,
   `name` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `type` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `domain_name_type` (`name`, `type`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
 -- --------------------------------------------------------
@@ -138,14 +144,16 @@ CREATE TABLE IF NOT EXISTS `domain` (
 --
 
 CREATE TABLE IF NOT EXISTS `domain_information` (
-  `id` int(64) NOT NULL,
+  `id` int(64) NOT NULL AUTO_INCREMENT,
   `domain_id` int(11) NOT NULL,
   `node` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
   `interface` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `interface_type` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
   `gre` tinyint(1) NOT NULL,
   `vlan` tinyint(1) NOT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `domain_information_domain_interface` (`domain_id`, `interface`),
+  KEY `domain_information_node` (`node`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
 -- --------------------------------------------------------
@@ -155,13 +163,14 @@ CREATE TABLE IF NOT EXISTS `domain_information` (
 --
 
 CREATE TABLE IF NOT EXISTS `domain_gre` (
-  `id` int(64) NOT NULL,
+  `id` int(64) NOT NULL AUTO_INCREMENT,
   `name` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `domain_info_id` int(64) NOT NULL,
   `local_ip` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `remote_ip` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
   `gre_key` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `domain_gre_domain_info` (`domain_info_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
 -- --------------------------------------------------------
@@ -171,13 +180,14 @@ CREATE TABLE IF NOT EXISTS `domain_gre` (
 --
 
 CREATE TABLE IF NOT EXISTS `domain_neighbor` (
-  `id` int(11) NOT NULL,
+  `id` int(11) NOT NULL AUTO_INCREMENT,
   `domain_info_id` int(11) NOT NULL,
   `neighbor_domain_name` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `neighbor_node` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
   `neighbor_interface` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
   `neighbor_domain_type` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `domain_neighbor_domain_info` (`domain_info_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
 -- --------------------------------------------------------
@@ -187,12 +197,13 @@ CREATE TABLE IF NOT EXISTS `domain_neighbor` (
 --
 
 CREATE TABLE IF NOT EXISTS `end_point` (
-  `id` int(64) NOT NULL,
+  `id` int(64) NOT NULL AUTO_INCREMENT,
   `name` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `type` varchar(64) COLLATE utf8_unicode_ci NOT NULL,
   `domain_name` varchar(64) COLLATE utf8_unicode_ci DEFAULT NULL,
   `interface` varchar(64) COLLATE utf8_unicode_ci,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `end_point_domain_interface` (`domain_name`, `interface`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
 
@@ -203,15 +214,71 @@ CREATE TABLE IF NOT EXISTS `end_point` (
 --
 
 CREATE TABLE IF NOT EXISTS `graph` (
-  `id` int(64) NOT NULL,
+  `id` int(64) NOT NULL AUTO_INCREMENT,
   `session_id` varchar(64) NOT NULL,
   `domain_id` int(11) DEFAULT NULL,
   `partial` tinyint(4) DEFAULT NULL,
   `service_graph` text NULL,
+  `deployed_version` varchar(64) DEFAULT NULL,
+  `end_points_recorded` tinyint(1) NOT NULL DEFAULT 0,
   PRIMARY KEY (`id`),
   UNIQUE KEY `service_graph_id` (`session_id`,`domain_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `graph_end_point`
+--
+
+CREATE TABLE IF NOT EXISTS `graph_end_point` (
+  `graph_id` int(64) NOT NULL,
+  `end_point_id` int(64) NOT NULL,
+  PRIMARY KEY (`graph_id`, `end_point_id`),
+  KEY `graph_end_point_end_point` (`end_point_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `session_history`
+--
+
+CREATE TABLE IF NOT EXISTS `session_history` (
+  `id` varchar(64) NOT NULL,
+  `user_id` varchar(64) DEFAULT NULL,
+  `service_graph_id` varchar(64) NOT NULL,
+  `service_graph_name` varchar(64) NOT NULL,
+  `ingress_node` varchar(64) DEFAULT NULL,
+  `egress_node` varchar(64) DEFAULT NULL,
+  `status` varchar(64) NOT NULL,
+  `started_at` datetime DEFAULT NULL,
+  `last_update` datetime DEFAULT NULL,
+  `error` datetime DEFAULT NULL,
+  `ended` datetime DEFAULT NULL,
+  `archived_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `session_history_user` (`user_id`, `ended`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `graph_history`
+--
+
+CREATE TABLE IF NOT EXISTS `graph_history` (
+  `id` int(64) NOT NULL,
+  `session_id` varchar(64) NOT NULL,
+  `domain_id` int(11) DEFAULT NULL,
+  `partial` tinyint(4) DEFAULT NULL,
+  `service_graph` text NULL,
+  `deployed_version` varchar(64) DEFAULT NULL,
+  `archived_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `graph_history_session` (`session_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
 --
 -- Dumping data for table `user`
 --
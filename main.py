@@ -12,8 +12,10 @@ import inspect
 
 from threading import Thread
 from service_layer_application_core.config import Configuration
-from service_layer_application_core.service_layer_application import ServiceLayer
+from service_layer_application_core.service_layer_application import ServiceLayer, ServiceLayerMetrics, \
+    ServiceLayerJob, ServiceLayerStatus, DBSessionMiddleware
 from service_layer_application_core.dd_client import DDClient
+from service_layer_application_core.retention import retention_job
 
 conf = Configuration()
 
@@ -37,12 +39,15 @@ logging.debug("Service Layer Starting")
 print("Welcome to the User-oriented Service Layer Application")
 
 # Falcon starts
-app = falcon.API()
+app = falcon.API(middleware=[DBSessionMiddleware()])
 logging.info("Starting Service Layer application")
 
 serviceLayer = ServiceLayer()
 app.add_route('/service-layer', serviceLayer)
 app.add_route('/service-layer/{mac_address}', serviceLayer)
+app.add_route('/service-layer/jobs/{job_id}', ServiceLayerJob())
+app.add_route('/service-layer/status', ServiceLayerStatus())
+app.add_route('/metrics', ServiceLayerMetrics())
 
 logging.info("Falcon Successfully started")
 
@@ -53,3 +58,8 @@ thread = Thread(target=dd_client.start)
 thread.start()
 
 logging.info("DoubleDecker Client Successfully started")
+
+# start the job that moves the ended sessions to the history tables
+if conf.DB_ARCHIVE_AFTER > 0:
+    retention_job.start()
+    logging.info("Retention job started")
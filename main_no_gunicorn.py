@@ -13,6 +13,7 @@ from threading import Thread
 
 from service_layer_application_core.config import Configuration
 from service_layer_application_core.dd_client import DDClient
+from service_layer_application_core.retention import retention_job
 
 # parse arguments
 # parser = argparse.ArgumentParser()
@@ -60,3 +61,8 @@ thread = Thread(target=dd_client.start)
 thread.start()
 
 logging.info("DoubleDecker Client Successfully started")
+
+# start the job that moves the ended sessions to the history tables
+if conf.DB_ARCHIVE_AFTER > 0:
+    retention_job.start()
+    logging.info("Retention job started")
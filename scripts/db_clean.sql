@@ -6,6 +6,8 @@ DELETE FROM domain_gre;
 
 DELETE FROM session;
 
+DELETE FROM graph_end_point;
+
 DELETE FROM graph;
 
 DELETE FROM end_point;
@@ -0,0 +1,18 @@
+-- Upgrade an existing service_layer database created with a db.sql older than
+-- the introduction of AUTO_INCREMENT ids: ids are now allocated by MySQL instead
+-- of being computed by the service layer.
+
+-- keep the rows having id 0 (the first id assigned by older versions)
+SET SQL_MODE = "NO_AUTO_VALUE_ON_ZERO";
+
+ALTER TABLE `domain` MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+ALTER TABLE `domain_information` MODIFY `id` int(64) NOT NULL AUTO_INCREMENT;
+
+ALTER TABLE `domain_gre` MODIFY `id` int(64) NOT NULL AUTO_INCREMENT;
+
+ALTER TABLE `domain_neighbor` MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+ALTER TABLE `end_point` MODIFY `id` int(64) NOT NULL AUTO_INCREMENT;
+
+ALTER TABLE `graph` MODIFY `id` int(64) NOT NULL AUTO_INCREMENT;
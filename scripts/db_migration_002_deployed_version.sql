@@ -0,0 +1,5 @@
+-- Upgrade an existing service_layer database to store, for each graph, the version
+-- of the graph deployed in the orchestrator: it allows to send only the differences
+-- from it when the graph is updated.
+
+ALTER TABLE `graph` ADD COLUMN `deployed_version` varchar(64) DEFAULT NULL AFTER `service_graph`;
@@ -0,0 +1,24 @@
+-- Upgrade an existing service_layer database adding the indexes used by the lookups
+-- of the service layer, that otherwise scan the whole tables (sessions are never purged).
+-- Mysql has no partial indexes: the active sessions are found through composite indexes
+-- ending with the `ended` and `error` columns, that are NULL for them.
+
+ALTER TABLE `session`
+  ADD INDEX `session_user_active` (`user_id`, `ended`, `error`),
+  ADD INDEX `session_service_graph_active` (`service_graph_id`, `ended`, `error`);
+
+ALTER TABLE `user` ADD INDEX `user_name` (`name`);
+
+ALTER TABLE `end_point` ADD INDEX `end_point_domain_interface` (`domain_name`, `interface`);
+
+ALTER TABLE `domain` ADD INDEX `domain_name_type` (`name`, `type`);
+
+ALTER TABLE `domain_information`
+  ADD INDEX `domain_information_domain_interface` (`domain_id`, `interface`),
+  ADD INDEX `domain_information_node` (`node`);
+
+ALTER TABLE `domain_gre` ADD INDEX `domain_gre_domain_info` (`domain_info_id`);
+
+ALTER TABLE `domain_neighbor` ADD INDEX `domain_neighbor_domain_info` (`domain_info_id`);
+
+ALTER TABLE `vnf_image` ADD INDEX `vnf_image_internal_id` (`internal_id`);
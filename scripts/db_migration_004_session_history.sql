@@ -0,0 +1,31 @@
+-- Upgrade an existing service_layer database adding the history tables, to which the
+-- retention job moves the ended sessions and their graphs.
+
+CREATE TABLE IF NOT EXISTS `session_history` (
+  `id` varchar(64) NOT NULL,
+  `user_id` varchar(64) DEFAULT NULL,
+  `service_graph_id` varchar(64) NOT NULL,
+  `service_graph_name` varchar(64) NOT NULL,
+  `ingress_node` varchar(64) DEFAULT NULL,
+  `egress_node` varchar(64) DEFAULT NULL,
+  `status` varchar(64) NOT NULL,
+  `started_at` datetime DEFAULT NULL,
+  `last_update` datetime DEFAULT NULL,
+  `error` datetime DEFAULT NULL,
+  `ended` datetime DEFAULT NULL,
+  `archived_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `session_history_user` (`user_id`, `ended`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+CREATE TABLE IF NOT EXISTS `graph_history` (
+  `id` int(64) NOT NULL,
+  `session_id` varchar(64) NOT NULL,
+  `domain_id` int(11) DEFAULT NULL,
+  `partial` tinyint(4) DEFAULT NULL,
+  `service_graph` text NULL,
+  `deployed_version` varchar(64) DEFAULT NULL,
+  `archived_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `graph_history_session` (`session_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
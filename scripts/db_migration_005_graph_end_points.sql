@@ -0,0 +1,14 @@
+-- Upgrade an existing service_layer database recording the end points referenced by each graph,
+-- so that the retention job finds the unused end points without decoding the stored graphs.
+-- The graphs already stored are recorded by the retention job, in batches, at its next runs.
+
+ALTER TABLE `graph` ADD COLUMN `end_points_recorded` tinyint(1) NOT NULL DEFAULT 0 AFTER `deployed_version`;
+
+CREATE TABLE IF NOT EXISTS `graph_end_point` (
+  `graph_id` int(64) NOT NULL,
+  `end_point_id` int(64) NOT NULL,
+  PRIMARY KEY (`graph_id`, `end_point_id`),
+  KEY `graph_end_point_end_point` (`end_point_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+ALTER TABLE `user_device` ADD KEY `user_device_end_point` (`endpoint_db_id`);
@@ -1,5 +1,7 @@
 DELETE FROM session;
 
+DELETE FROM graph_end_point;
+
 DELETE FROM graph;
 
 DELETE FROM user_device;
@@ -5,9 +5,15 @@ Created on Apr 14, 2016
 """
 import json
 import logging
+import threading
+import time
 
+from service_layer_application_core.common.cache import LRUCache
 from service_layer_application_core.common.user_session import UserSession
 from service_layer_application_core.config import Configuration
+from service_layer_application_core.exception import SessionNotFound
+from service_layer_application_core.nffg_clone import clone
+from service_layer_application_core.nffg_ids import GraphIdAllocator
 from service_layer_application_core.controller import ServiceLayerController
 from service_layer_application_core.nffg_manager import NFFG_Manager
 from service_layer_application_core.orchestrator_rest import GlobalOrchestrator
@@ -18,6 +24,7 @@ from service_layer_application_core.sql.user import User
 from service_layer_application_core.sql.domain import Domain
 from service_layer_application_core.user_authentication import UserData
 from service_layer_application_core.isp_graph_manager import ISPGraphManager
+from service_layer_application_core import metrics
 from nffg_library.nffg import NF_FG, EndPoint, FlowRule, Port, Match, Action
 
 from .domain_info import DomainInfo
@@ -32,6 +39,100 @@ INGRESS_TYPE = Configuration().INGRESS_TYPE
 
 VNF_AWARE_DOMAINS = Configuration().VNF_AWARE_DOMAINS
 
+ADMIN_NAME = Configuration().ADMIN_NAME
+# id of the switch VNF of the authentication graph, to whose ports the user end points are attached
+AUTH_SWITCH_VNF_ID = '00000001'
+
+# identity of the admin, as (id, name, password, tenant name)
+_admin_identity = LRUCache(1, ttl=Configuration().AUTH_CACHE_TTL)
+
+
+def _get_admin_identity():
+    identity = _admin_identity.get(ADMIN_NAME)
+    if identity is None:
+        admin_model = User().getUser(ADMIN_NAME)
+        identity = (admin_model.id, admin_model.name, admin_model.password,
+                    User().getTenantName(admin_model.tenant_id))
+        _admin_identity.put(ADMIN_NAME, identity)
+    return identity
+
+
+class AuthGraphSnapshot(object):
+    """
+    A version of the authentication graph stored in the database
+    """
+
+    def __init__(self, version, graph_id, domain_id, nffg):
+        self.version = version
+        self.graph_id = graph_id
+        self.domain_id = domain_id
+        # shared by all the requests, so it must not be modified
+        self.nffg = nffg
+        # end points attached to the switch virtual ports looked up so far
+        self.end_points_by_port = {}
+        self.checked_at = time.time()
+
+
+class AuthGraphCache(object):
+    """
+    Keeps in memory the current version of the authentication graph.
+    The version in memory is compared with the one stored in the database at most every check_interval seconds,
+    and reloaded if it changed (e.g. updated by another process); updates made by this process are loaded
+    as soon as they are stored.
+    """
+
+    def __init__(self, check_interval=Configuration().AUTH_GRAPH_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, admin_id, force_check=False):
+        """
+        Returns the current version of the authentication graph
+
+        :param admin_id: the id of the admin, owner of the authentication graph
+        :param force_check: if True, the version is compared with the stored one even if checked recently
+        :return: the current version, or None if the authentication graph is not instantiated
+        :rtype: AuthGraphSnapshot
+        """
+        snapshot = self._snapshot
+        if not force_check and snapshot is not None and time.time() - snapshot.checked_at < self.check_interval:
+            return snapshot
+        with self._lock:
+            try:
+                graph_id, version = Graph.get_last_graph_version_of_user(admin_id)
+            except SessionNotFound:
+                self._snapshot = None
+                return None
+            snapshot = self._snapshot
+            if snapshot is not None and version is not None \
+                    and snapshot.version == version and snapshot.graph_id == graph_id:
+                snapshot.checked_at = time.time()
+                return snapshot
+            logging.debug("Loading version '" + str(version) + "' of the authentication graph")
+            snapshot = AuthGraphSnapshot(version, graph_id, Graph.get_domain_id(graph_id),
+                                         Graph.get_service_graph(graph_id))
+            self.loads += 1
+            # a graph stored without version can not be checked, so it is not kept
+            self._snapshot = snapshot if version is not None else None
+            return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def getDict(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot is not None else None,
+            'ports': len(snapshot.end_points_by_port) if snapshot is not None else 0,
+            'loads': self.loads
+        }
+
+auth_graph_cache = AuthGraphCache()
+metrics.register('auth_graph_cache', auth_graph_cache.getDict)
+
 
 class AuthGraphManager:
     orchestrator_ip = Configuration().ORCH_IP
@@ -39,16 +140,12 @@ class AuthGraphManager:
 
     def __init__(self):
         # self.graph_instantiated = False
-        admin_model = User().getUser(Configuration().ADMIN_NAME)
-        self.admin_id = admin_model.id
-        self.admin_name = admin_model.name
-        self.admin_password = admin_model.password
-        self.admin_tenant = User().getTenantName(admin_model.tenant_id)
+        self.admin_id, self.admin_name, self.admin_password, self.admin_tenant = _get_admin_identity()
         self.current_domain_id = None
         # get current instance of authentication service-graph
-        if Session().checkSession(self.admin_id):
-            session_id = Session().get_active_user_session(self.admin_id).id
-            self.current_domain_id = Graph().get_last_graph(session_id).domain_id
+        snapshot = auth_graph_cache.get(self.admin_id)
+        if snapshot is not None:
+            self.current_domain_id = snapshot.domain_id
 
     def instantiate_auth_graph(self, domain_info=None):
         """
@@ -82,6 +179,7 @@ class AuthGraphManager:
                 user_data = UserData(self.admin_name, self.admin_password, self.admin_tenant)
                 controller = ServiceLayerController(user_data)
                 controller.put(domain_name=domain_name, nffg=nffg)
+                auth_graph_cache.get(self.admin_id, force_check=True)
                 logging.info("Authentication graph correctly instantiated")
                 print("Authentication graph instantiated")
                 if domain_name is not None:
@@ -107,6 +205,8 @@ class AuthGraphManager:
             user_data = UserData(self.admin_name, self.admin_password, self.admin_tenant)
             controller = ServiceLayerController(user_data)
             controller.put(domain_name=current_domain.name, nffg=nffg)
+            # write-through: the new version is loaded immediately
+            auth_graph_cache.get(self.admin_id, force_check=True)
             logging.info("Authentication graph updated")
             print("Authentication graph updated")
         except Exception as err:
@@ -222,8 +322,7 @@ class AuthGraphManager:
         # get current instance of authentication service-graph
         session_id = Session().get_active_user_session(self.admin_id).id
         current_domain_name = Domain().get_domain(self.current_domain_id).name
-        nffg = NF_FG()
-        nffg.parseDict(json.loads(Graph.get_last_graph(session_id).service_graph))
+        nffg = Graph.get_last_service_graph(session_id)
         if nffg is not None:
 
             # get the outer interface of the new domain (maybe I don't need it really)
@@ -235,6 +334,10 @@ class AuthGraphManager:
             logging.debug("Adding end points to auth-graph for the new domain: '" + remote_domain_info.name + "'")
 
             new_endpoints = False
+            # ids are allocated without scanning the graph for each new element
+            id_allocator = GraphIdAllocator(nffg)
+            switch_vnf = nffg.getVNF(AUTH_SWITCH_VNF_ID)
+            port_label = switch_vnf.ports[0].id.split(":")[0]
             for interface in remote_domain_info.interfaces:
                 if interface.isAccess():
                     # prepare a db entry for this end-point to allow the future characterization
@@ -250,7 +353,7 @@ class AuthGraphManager:
                     )
                     # create a new end-point
                     end_point = EndPoint(
-                        _id=nffg.getNextAvailableEndPointId(),
+                        _id=id_allocator.nextEndPointId(),
                         name=end_point_name,
                         db_id=end_point_db_id
                     )
@@ -259,10 +362,7 @@ class AuthGraphManager:
                                   json.dumps(end_point.getDict(extended=True, domain=True)))
 
                     # add a new port to the switch VNF
-                    switch_vnf = nffg.getVNF("00000001")
-                    port_label = switch_vnf.ports[0].id.split(":")[0]
-                    new_relative_id = int(switch_vnf.getHigherReletiveIDForPortLabel(port_label)) + 1
-                    new_port = Port(port_label + ":" + str(new_relative_id))
+                    new_port = Port(id_allocator.nextPortId(switch_vnf, port_label))
                     switch_vnf.addPort(new_port)
                     logging.debug("New port '" + new_port.id + "' inserted into switch VNF")
                     logging.debug("Updated VNF: '" + str(switch_vnf.getDict(domain=True)))
@@ -270,7 +370,7 @@ class AuthGraphManager:
                     # insert two flow rules to connect the end point to the switch VNF
                     logging.debug("Creating flow rules for endpoint '" + end_point.id + "'...")
                     to_user_flow_rule = FlowRule(
-                        _id=nffg.getNextAvailableFlowRuleId(),
+                        _id=id_allocator.nextFlowRuleId(),
                         priority=1,
                         match=Match(port_in='vnf:' + switch_vnf.id + ':' + new_port.id)
                     )
@@ -278,7 +378,7 @@ class AuthGraphManager:
                     nffg.addFlowRule(to_user_flow_rule)
                     logging.debug("Appended flow rule: " + str(to_user_flow_rule.getDict()))
                     from_user_flow_rule = FlowRule(
-                        _id=nffg.getNextAvailableFlowRuleId(),
+                        _id=id_allocator.nextFlowRuleId(),
                         priority=1,
                         match=Match(port_in='endpoint:' + end_point.id)
                     )
@@ -288,7 +388,7 @@ class AuthGraphManager:
 
                     # insert flow rules to allow users to reach CP after authentication
                     to_cp_arp_flow_rule = FlowRule(
-                        _id=nffg.getNextAvailableFlowRuleId(),
+                        _id=id_allocator.nextFlowRuleId(),
                         priority=65535,
                         match=Match(
                             port_in='endpoint:' + end_point.id,
@@ -300,7 +400,7 @@ class AuthGraphManager:
                     nffg.addFlowRule(to_cp_arp_flow_rule)
                     logging.debug("Appended flow rule: " + str(to_cp_arp_flow_rule.getDict()))
                     to_cp_ip_flow_rule = FlowRule(
-                        _id=nffg.getNextAvailableFlowRuleId(),
+                        _id=id_allocator.nextFlowRuleId(),
                         priority=65535,
                         match=Match(
                             port_in='endpoint:' + end_point.id,
@@ -324,8 +424,7 @@ class AuthGraphManager:
         # get current instance of authentication service-graph
         session_id = Session().get_active_user_session(self.admin_id).id
         # current_domain_name = Domain().get_domain(self.current_domain_id).name
-        nffg = NF_FG()
-        nffg.parseDict(json.loads(Graph.get_last_graph(session_id).service_graph))
+        nffg = Graph.get_last_service_graph(session_id)
         end_point_db_entry = EndPointDB.get_end_point_by_domain_interface(remote_domain_name, interface)
 
         # delete end point from graph
@@ -351,13 +450,28 @@ class AuthGraphManager:
 
         logging.debug("getting end point from switch virtual port: '" + switch_vnf_port + "'")
         # get current instance of authentication service-graph
-        session_id = Session().get_active_user_session(self.admin_id).id
-        # current_domain_name = Domain().get_domain(self.current_domain_id).name
-        nffg = NF_FG()
-        nffg.parseDict(json.loads(Graph.get_last_graph(session_id).service_graph))
+        snapshot = auth_graph_cache.get(self.admin_id)
+        if snapshot is None:
+            raise SessionNotFound("Session Not Found")
+        end_point = snapshot.end_points_by_port.get(switch_vnf_port)
+        if end_point is None:
+            try:
+                end_point = self._get_endpoint_from_switch_port(snapshot.nffg, switch_vnf_port)
+            except (IndexError, AttributeError):
+                # the port may have been added by another process since the last check
+                snapshot = auth_graph_cache.get(self.admin_id, force_check=True)
+                if snapshot is None:
+                    raise SessionNotFound("Session Not Found")
+                end_point = self._get_endpoint_from_switch_port(snapshot.nffg, switch_vnf_port)
+            snapshot.end_points_by_port[switch_vnf_port] = end_point
+        logging.debug("Attached endpoint is: " + str(end_point.getDict(extended=True, domain=True)))
+        # the end point is shared with the cached graph
+        return clone(end_point)
+
+    def _get_endpoint_from_switch_port(self, nffg, switch_vnf_port):
 
         # get the switch vnf from the graph
-        switch_vnf = nffg.getVNF('00000001')
+        switch_vnf = nffg.getVNF(AUTH_SWITCH_VNF_ID)
 
         # get the template of the switch vnf
         user_data = UserData(self.admin_name, self.admin_password, self.admin_tenant)
@@ -369,9 +483,7 @@ class AuthGraphManager:
         logging.debug("Port name in nffg is: '" + port_label + "'")
 
         # get the end point attached to this port
-        end_point = nffg.getEndPointsSendingTrafficToPort(switch_vnf.id, port_label)[0]
-        logging.debug("Attached endpoint is: " + str(end_point.getDict(extended=True, domain=True)))
-        return end_point
+        return nffg.getEndPointsSendingTrafficToPort(switch_vnf.id, port_label)[0]
 
     def delete_auth_graph(self):
 
@@ -379,6 +491,7 @@ class AuthGraphManager:
         controller = ServiceLayerController(user_data)
         try:
             controller.delete(None)
+            auth_graph_cache.invalidate()
             logging.info("Authentication graph deleted")
             print("Authentication graph deleted")
             self.current_domain_id = None
@@ -12,6 +12,7 @@ from service_layer_application_core.authentication_graph_manager import AuthGrap
 from service_layer_application_core.common.user_session import UserSession
 from service_layer_application_core.config import Configuration
 from service_layer_application_core.exception import GraphNotFound, SessionNotFound
+from service_layer_application_core.nffg_ids import GraphIdAllocator
 from service_layer_application_core.nffg_manager import NFFG_Manager
 from service_layer_application_core.orchestrator_rest import GlobalOrchestrator
 from service_layer_application_core.sql.end_point import EndPointDB
@@ -38,7 +39,7 @@ class ClientGraphManager:
         self.user_name = user_data.username
         self.user_password = user_data.password
         self.user_tenant = user_data.tenant
-        self.user_id = User().getUser(self.user_name).id
+        self.user_id = user_data.getUserID()
         self.current_domain_id = None
         # get the user service graph instance from db
         self.nffg = self._get_current_instance()
@@ -73,9 +74,10 @@ class ClientGraphManager:
                 break
 
         if not end_point_is_present:
+            id_allocator = GraphIdAllocator(self.nffg)
             # create a new end_point for this user
             service_user_end_point = EndPoint(
-                _id=self.nffg.getNextAvailableEndPointId(),
+                _id=id_allocator.nextEndPointId(),
                 name=auth_user_end_point.name,
                 db_id=auth_user_end_point.db_id
             )
@@ -90,7 +92,7 @@ class ClientGraphManager:
             # insert two flow rules to connect the end point to the first VNF
             logging.debug("Creating flow rules for endpoint '" + service_user_end_point.id + "'...")
             to_user_flow_rule = FlowRule(
-                _id=self.nffg.getNextAvailableFlowRuleId(),
+                _id=id_allocator.nextFlowRuleId(),
                 priority=10,
                 match=Match(port_in='vnf:' + ingress_vnf.id + ':' + user_port.id)
             )
@@ -98,7 +100,7 @@ class ClientGraphManager:
             self.nffg.addFlowRule(to_user_flow_rule)
             logging.debug("Appended flow rule: " + str(to_user_flow_rule.getDict()))
             from_user_flow_rule = FlowRule(
-                _id=self.nffg.getNextAvailableFlowRuleId(),
+                _id=id_allocator.nextFlowRuleId(),
                 priority=10,
                 match=Match(port_in='endpoint:' + service_user_end_point.id)
             )
@@ -111,10 +113,18 @@ class ClientGraphManager:
 
         return service_user_end_point.id
 
-    def delete_endpoint_from_user_device_if_last(self, mac_address):
+    def delete_endpoint_from_user_device_if_last(self, mac_address, removed_mac_addresses=()):
+        """
+        delete from the graph the end point of the device if no other device is attached to it
+        :param mac_address:
+        :param removed_mac_addresses: devices already detached from the graph, not to be taken into account
+        :return:
+        """
 
         user_device = Session().get_user_device(self.user_id, mac_address)
-        user_devices = Session().get_active_user_devices_for_endpoint(self.user_id, user_device.endpoint_id)
+        user_devices = [device for device in
+                        Session().get_active_user_devices_for_endpoint(self.user_id, user_device.endpoint_id)
+                        if device.mac_address not in removed_mac_addresses]
 
         # delete endpoint if is the last device
         if len(user_devices) == 1:
@@ -142,6 +152,15 @@ class ClientGraphManager:
             isp_end_point_model = EndPointDB.get_end_point(
                 isp_nffg.getEndPointsFromName(ISP_INGRESS)[0].db_id
             )
+            # the entry of the previous logins is kept while it still matches the isp ingress: the graph does not
+            # change at each login, so the profile prepared for it can be got from the cache
+            if user_egress_endpoint.db_id is not None:
+                end_point_model = EndPointDB.get_end_point(user_egress_endpoint.db_id)
+                if end_point_model is not None \
+                        and end_point_model.name == user_egress_endpoint.name \
+                        and end_point_model.domain_name == isp_end_point_model.domain_name \
+                        and end_point_model.interface == isp_end_point_model.interface:
+                    return
             # prepare an entry for this end point in db
             user_egress_endpoint_db_id = EndPointDB.add_end_point(
                 name=user_egress_endpoint.name,
@@ -180,8 +199,7 @@ class ClientGraphManager:
         try:
             session_id = Session().get_active_user_session(self.user_id).id
             # current_domain_name = Domain().get_domain(self.current_domain_id).name
-            nffg = NF_FG()
-            nffg.parseDict(json.loads(Graph.get_last_graph(session_id).service_graph))
+            nffg = Graph.get_last_service_graph(session_id)
         except SessionNotFound:
             nffg = None
         return nffg
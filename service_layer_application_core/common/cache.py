@@ -0,0 +1,145 @@
+"""
+Created on Oct 18, 2026
+
+Thread-safe in-memory cache shared by the components of a service layer process.
+"""
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class LRUCache(object):
+    """
+    Size-bounded cache with least recently used eviction.
+    Entries optionally expire after a time to live (in seconds) from their insertion.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        """
+
+        :param max_size: maximum number of entries kept in the cache
+        :param ttl: default time to live of the entries, if None entries never expire
+        :type max_size: int
+        :type ttl: float
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the value cached for the key, or default if it is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None):
+        """
+        Caches the value for the key, evicting the least recently used entries if the cache is full
+
+        :param ttl: time to live of this entry, if None the default one of the cache is used
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """
+        Returns whether the key has a value not expired, without affecting the usage counters and the eviction order
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.time())
+
+    def getDict(self):
+        """
+        Returns the usage counters of the cache
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent calls: while a call for a key is in progress, the other callers asking for
+    the same key wait for it and share its result (or its exception) instead of calling again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, function):
+        """
+        Calls the function, unless a call for the same key is already in progress
+
+        :param key: identifies the calls that can share their result
+        :param function: callable without arguments
+        :return: the result of the function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return call.result()
+        try:
+            result = function()
+        except BaseException as err:
+            call.set_exception(err)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def getDict(self):
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_progress': len(self._calls)}
@@ -0,0 +1,94 @@
+"""
+Created on Oct 18, 2026
+
+Encoding of the service graphs stored in the database.
+A stored graph starts with a header 'sg1;<codec>;<content hash>;' followed by the graph encoded by
+the codec; graphs stored by previous versions (plain json, without header) are still readable.
+"""
+import base64
+import json
+import zlib
+
+FORMAT_VERSION = 'sg1'
+# length of the longest header, enough to read the content hash of a stored graph
+HEADER_LENGTH = 64
+
+_codecs = {}
+
+
+def register_codec(name, encoder, decoder, binary=True):
+    """
+    Registers a codec for the stored graphs
+
+    :param name: the name of the codec, written in the header of the graphs it encodes
+    :param encoder: callable taking the graph as dict and its canonical json as bytes, returning bytes
+    :param decoder: callable taking the bytes returned by the encoder, returning the graph as dict
+    :param binary: if the encoded bytes are not text, they are stored in base64
+    :type name: str
+    :type binary: bool
+    """
+    _codecs[name] = (encoder, decoder, binary)
+
+
+register_codec('json', lambda nffg_dict, canonical: canonical,
+               lambda data: json.loads(data.decode('utf-8')), binary=False)
+register_codec('zlib', lambda nffg_dict, canonical: zlib.compress(canonical),
+               lambda data: json.loads(zlib.decompress(data).decode('utf-8')))
+try:
+    import msgpack
+    register_codec('msgpack', lambda nffg_dict, canonical: msgpack.packb(nffg_dict, use_bin_type=True),
+                   lambda data: msgpack.unpackb(data, raw=False))
+except ImportError:
+    pass
+
+
+def get_codecs():
+    return sorted(_codecs)
+
+
+def encode(payload, codec):
+    """
+    Encodes a graph to be stored
+
+    :param payload: the graph, with its extended dict
+    :param codec: the name of a registered codec
+    :type payload: GraphPayload
+    :type codec: str
+    :return: the encoded graph and the hash of its content (its version)
+    :rtype: tuple
+    """
+    encoder, _, binary = _codecs[codec]
+    data = encoder(payload.nffg_dict, payload.canonical)
+    encoded = base64.b64encode(data).decode('ascii') if binary else data.decode('utf-8')
+    return ';'.join((FORMAT_VERSION, codec, payload.version, encoded)), payload.version
+
+
+def read_hash(stored_graph):
+    """
+    Returns the content hash written in the header of a stored graph
+
+    :param stored_graph: the stored graph, or at least its first HEADER_LENGTH characters
+    :type stored_graph: str
+    :return: the hash, or None if the graph has no header
+    :rtype: str
+    """
+    if stored_graph is None or not stored_graph.startswith(FORMAT_VERSION + ';'):
+        return None
+    return stored_graph.split(';', 3)[2]
+
+
+def decode(stored_graph):
+    """
+    Decodes a stored graph
+
+    :type stored_graph: str
+    :return: the graph, as accepted by NF_FG.parseDict()
+    :rtype: dict
+    """
+    if not stored_graph.startswith(FORMAT_VERSION + ';'):
+        # stored by a previous version
+        return json.loads(stored_graph)
+    _, codec, _, payload = stored_graph.split(';', 3)
+    _, decoder, binary = _codecs[codec]
+    data = base64.b64decode(payload) if binary else payload.encode('utf-8')
+    return decoder(data)
@@ -0,0 +1,87 @@
+"""
+Created on Oct 18, 2026
+
+Registry of the graphs defined in files (ingress, egress, authentication, ISP and user graphs).
+"""
+import json
+import logging
+import os
+import threading
+
+from nffg_library.validator import ValidateNF_FG
+from nffg_library.nffg import NF_FG
+from service_layer_application_core.nffg_clone import clone
+
+
+class GraphTemplateRegistry(object):
+    """
+    Loads, validates and parses each graph file once, keeping it in memory until the file is modified.
+    Every request gets its own (structural) copy of the graph, so it can be freely modified.
+    """
+
+    def __init__(self, folder):
+        """
+
+        :param folder: the folder containing the graph files
+        :type folder: str
+        """
+        self.folder = folder
+        # file name -> (modification time, size, parsed graph)
+        self._graphs = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def getNF_FG(self, file_name):
+        """
+        Returns a copy of the graph defined in the file
+
+        :param file_name: the name of the file, relative to the folder of the registry
+        :type file_name: str
+        :rtype: NF_FG
+        """
+        path = os.path.join(self.folder, file_name)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._graphs.get(file_name)
+            if entry is not None and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+                self.hits += 1
+                return clone(entry[2])
+        nffg = self._load(path)
+        with self._lock:
+            self._graphs[file_name] = (stat.st_mtime, stat.st_size, nffg)
+            self.loads += 1
+        return clone(nffg)
+
+    def getVersion(self, file_name):
+        """
+        Returns a version of the graph file, that changes whenever the file is modified
+
+        :rtype: tuple
+        """
+        stat = os.stat(os.path.join(self.folder, file_name))
+        return file_name, stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def _load(path):
+        logging.debug("Loading graph from file '" + path + "'")
+        with open(path) as graph_file:
+            nffg_dict = json.load(graph_file)
+        ValidateNF_FG().validate(nffg_dict)
+        nffg = NF_FG()
+        nffg.parseDict(nffg_dict)
+        return nffg
+
+    def invalidate(self, file_name=None):
+        """
+        Forgets a graph, or all the graphs if no file is specified, so that they are loaded again
+        """
+        with self._lock:
+            if file_name is None:
+                self._graphs.clear()
+            else:
+                self._graphs.pop(file_name, None)
+
+    def getDict(self):
+        with self._lock:
+            return {'graphs': len(self._graphs), 'hits': self.hits, 'loads': self.loads}
@@ -0,0 +1,98 @@
+"""
+Created on Oct 18, 2026
+
+Cache of the graphs prepared for the deployment (lowered profiles), before the flows of the devices are added.
+"""
+import threading
+
+from service_layer_application_core.config import Configuration
+from service_layer_application_core.common.cache import LRUCache
+from service_layer_application_core.nffg_clone import clone
+from service_layer_application_core import metrics
+
+
+class LoweredProfileCache(object):
+    """
+    Keeps the graphs prepared from the same inputs, along with the resources they depend on (e.g. VNF templates
+    or end points of the database): when a resource changes, the graphs depending on it are forgotten.
+    Cached graphs are never returned, only copies of them.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        """
+
+        :param max_size: maximum number of graphs kept
+        :param ttl: seconds after which a graph is prepared again, to follow the resources changed elsewhere
+        :type max_size: int
+        :type ttl: float
+        """
+        self._profiles = LRUCache(max_size, ttl=ttl)
+        # the dependencies of the graphs no longer cached are pruned when they exceed this number
+        self._max_dependencies = max_size * 8
+        # dependency -> keys of the graphs depending on it
+        self._dependents = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        :return: a copy of the graph prepared for the key, or None if it is not cached
+        :rtype: NF_FG
+        """
+        nffg = self._profiles.get(key)
+        if nffg is None:
+            return None
+        return clone(nffg)
+
+    def put(self, key, nffg, dependencies):
+        """
+        Caches a copy of the prepared graph
+
+        :param key: identifies the inputs from which the graph has been prepared
+        :param nffg: the prepared graph
+        :param dependencies: the resources used to prepare the graph, e.g. ('template', location)
+        :type nffg: NF_FG
+        :type dependencies: set
+        """
+        nffg = clone(nffg)
+        with self._lock:
+            for dependency in dependencies:
+                self._dependents.setdefault(dependency, set()).add(key)
+            self._profiles.put(key, nffg)
+            if len(self._dependents) > self._max_dependencies:
+                self._prune()
+
+    def _prune(self):
+        for dependency, keys in list(self._dependents.items()):
+            keys = {key for key in keys if key in self._profiles}
+            if keys:
+                self._dependents[dependency] = keys
+            else:
+                del self._dependents[dependency]
+
+    def invalidate(self, dependency):
+        """
+        Forgets the graphs depending on the resource
+        """
+        with self._lock:
+            keys = self._dependents.pop(dependency, ())
+            for key in keys:
+                self._profiles.invalidate(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._dependents.clear()
+            self._profiles.clear()
+
+    def getDict(self):
+        counters = self._profiles.getDict()
+        with self._lock:
+            counters['dependencies'] = len(self._dependents)
+            counters['invalidations'] = self.invalidations
+        return counters
+
+# graphs prepared by the controllers of this process; they are prepared again when the templates they use
+# could have been got again from the orchestrator
+lowered_profiles = LoweredProfileCache(max(Configuration().PROFILE_CACHE_SIZE, 1), ttl=Configuration().TEMPLATE_CACHE_TTL)
+metrics.register('profile_cache', lowered_profiles.getDict)
@@ -0,0 +1,69 @@
+"""
+Created on Oct 18, 2026
+
+Notification of the changes of the sessions to the requests waiting for them in this process.
+"""
+import threading
+import time
+
+
+class StatusNotifier(object):
+    """
+    Counts the changes notified for each key (e.g. a session id or a user id), waking up the threads waiting
+    for one of them. Notifications only carry the fact that something changed: waiters read the new state
+    from the database, so changes made by other processes are seen by polling it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generations = {}
+        self.notifications = 0
+        self.waiters = 0
+
+    def notify(self, *keys):
+        with self._condition:
+            for key in keys:
+                if key is not None:
+                    self._generations[key] = self._generations.get(key, 0) + 1
+            self.notifications += 1
+            self._condition.notify_all()
+
+    def get_generations(self, keys):
+        """
+        :return: the number of changes notified so far for each key, to be passed to wait()
+        :rtype: tuple
+        """
+        with self._condition:
+            return tuple(self._generations.get(key, 0) for key in keys)
+
+    def wait(self, keys, generations, timeout):
+        """
+        Waits until a change is notified for one of the keys after the given generations, or the timeout expires
+
+        :param keys: the keys to wait for
+        :param generations: as returned by get_generations for the same keys
+        :param timeout: maximum seconds to wait
+        :type keys: tuple
+        :type generations: tuple
+        :type timeout: float
+        :return: True if a change has been notified
+        :rtype: bool
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            self.waiters += 1
+            try:
+                while tuple(self._generations.get(key, 0) for key in keys) == generations:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return True
+            finally:
+                self.waiters -= 1
+
+    def getDict(self):
+        with self._condition:
+            return {'notifications': self.notifications, 'waiters': self.waiters}
+
+status_notifier = StatusNotifier()
@@ -18,15 +18,24 @@ class UserSession(object):
         self.user_id = user_id
         self.token = token
         
-    def checkSession(self, nffg_id, orchestrator):
+    def checkSession(self, nffg_id, orchestrator, session_context=None):
         """
         return true if there is already an active session of the user
         and it is really instantiated in a node
+
+        :param session_context: the active session of the user, if already loaded
+        :type session_context: SessionContext
         """
 
-        session_status = Session().checkSession(self.user_id)
+        if session_context is not None:
+            session_status = session_context.is_active()
+        else:
+            session_status = Session().checkSession(self.user_id)
         if session_status is True:
-            user_session = Session().get_active_user_session(self.user_id)
+            if session_context is not None:
+                user_session = session_context.session
+            else:
+                user_session = Session().get_active_user_session(self.user_id)
             if DEBUG_MODE is False:
                 try:
                     response = json.loads(orchestrator.getNFFGStatus(nffg_id))
@@ -41,6 +41,18 @@ class Configuration(object, metaclass=Singleton):
         self._VERBOSE = config.getboolean('log', 'verbose')
         self._DEBUG = config.getboolean('log', 'debug')
         self._DB_CONNECTION = config.get('db', 'connection')
+        self._DB_POOL_SIZE = config.getint('db', 'pool_size', fallback=10)
+        self._DB_MAX_OVERFLOW = config.getint('db', 'max_overflow', fallback=20)
+        self._DB_POOL_TIMEOUT = config.getint('db', 'pool_timeout', fallback=30)
+        self._DB_POOL_RECYCLE = config.getint('db', 'pool_recycle', fallback=3600)
+        self._DB_POOL_PRE_PING = config.getboolean('db', 'pool_pre_ping', fallback=True)
+        self._DB_GRAPH_CODEC = config.get('db', 'graph_codec', fallback='zlib')
+        self._DB_GRAPH_CACHE_SIZE = config.getint('db', 'graph_cache_size', fallback=256)
+        self._DB_SLOW_QUERY_THRESHOLD = config.getfloat('db', 'slow_query_threshold', fallback=0)
+        self._DB_EXPLAIN_SLOW_QUERIES = config.getboolean('db', 'explain_slow_queries', fallback=True)
+        self._DB_ARCHIVE_AFTER = config.getint('db', 'archive_after', fallback=86400)
+        self._DB_RETENTION_INTERVAL = config.getint('db', 'retention_interval', fallback=600)
+        self._DB_RETENTION_BATCH_SIZE = config.getint('db', 'retention_batch_size', fallback=200)
         self._NOBODY_USERNAME = config.get('nobody', 'username')
         self._NOBODY_PASSWORD = config.get('nobody', 'password')
         self._NOBODY_TENANT = config.get('nobody', 'tenant')
@@ -62,17 +74,42 @@ class Configuration(object, metaclass=Singleton):
 
         self._SERVICE_LAYER_IP = config.get('service_layer', 'ip')
         self._SERVICE_LAYER_PORT = config.get('service_layer', 'port')
+        self._ASYNC_DEPLOYMENT = config.getboolean('service_layer', 'async_deployment', fallback=False)
+        self._DEPLOYMENT_WORKERS = config.getint('service_layer', 'deployment_workers', fallback=4)
+        self._DEPLOYMENT_QUEUE_SIZE = config.getint('service_layer', 'deployment_queue_size', fallback=100)
+        self._STATUS_WAIT_TIMEOUT = config.getint('service_layer', 'status_wait_timeout', fallback=30)
+        self._STATUS_POLL_INTERVAL = config.getfloat('service_layer', 'status_poll_interval', fallback=1)
+        self._PROFILE_CACHE_SIZE = config.getint('service_layer', 'profile_cache_size', fallback=256)
+        self._DEVICE_BATCH_WINDOW = config.getfloat('service_layer', 'device_batch_window', fallback=0)
+        self._AUTH_CACHE_TTL = config.getfloat('service_layer', 'auth_cache_ttl', fallback=30)
+        self._AUTH_CACHE_SIZE = config.getint('service_layer', 'auth_cache_size', fallback=1024)
+        self._AUTH_GRAPH_CHECK_INTERVAL = config.getfloat('service_layer', 'auth_graph_check_interval', fallback=5)
 
         self._DD_NAME = config.get('doubledecker', 'dd_name')
         self._DD_CUSTOMER = config.get('doubledecker', 'dd_customer')
         self._BROKER_ADDRESS = config.get('doubledecker', 'broker_address')
         self._DD_KEYFILE = config.get('doubledecker', 'dd_keyfile')
+        self._DD_TEMPLATE_TOPIC = config.get('doubledecker', 'template_topic', fallback='')
+        self._DD_USER_TOPIC = config.get('doubledecker', 'user_topic', fallback='')
 
         self._DEBUG_MODE = config.getboolean('orchestrator', 'debug_mode')
 
         self._ORCH_PORT = config.get('orchestrator', 'port')
         self._ORCH_IP = config.get('orchestrator', 'ip')
         self._ORCH_TIMEOUT = config.get('orchestrator', 'timeout')
+        self._ORCH_CONNECT_TIMEOUT = config.getfloat('orchestrator', 'connect_timeout', fallback=5)
+        self._ORCH_POOL_SIZE = config.getint('orchestrator', 'pool_size', fallback=10)
+        self._ORCH_RETRIES = config.getint('orchestrator', 'retries', fallback=3)
+        self._ORCH_RETRY_BACKOFF = config.getfloat('orchestrator', 'retry_backoff', fallback=0.5)
+        self._TEMPLATE_CACHE_TTL = config.getint('orchestrator', 'template_cache_ttl', fallback=300)
+        self._TEMPLATE_CACHE_SIZE = config.getint('orchestrator', 'template_cache_size', fallback=256)
+        self._TEMPLATE_FETCH_WORKERS = config.getint('orchestrator', 'template_fetch_workers', fallback=8)
+        self._ORCH_INCREMENTAL_UPDATE = config.getboolean('orchestrator', 'incremental_update', fallback=True)
+        self._ORCH_DEPLOYED_GRAPH_CACHE_SIZE = config.getint('orchestrator', 'deployed_graph_cache_size',
+                                                             fallback=1024)
+        self._ORCH_STATUS_CACHE_TTL = config.getfloat('orchestrator', 'status_cache_ttl', fallback=10)
+        self._ORCH_STATUS_MIN_TTL = config.getfloat('orchestrator', 'status_min_ttl', fallback=0.5)
+        self._ORCH_STATUS_MAX_TTL = config.getfloat('orchestrator', 'status_max_ttl', fallback=4)
 
         self._CAPTIVE_PORTAL_IP = config.get('captive_portal', 'ip')
 
@@ -111,10 +148,98 @@ class Configuration(object, metaclass=Singleton):
     def SERVICE_LAYER_PORT(self):
         return self._SERVICE_LAYER_PORT
 
+    @property
+    def ASYNC_DEPLOYMENT(self):
+        return self._ASYNC_DEPLOYMENT
+
+    @property
+    def DEPLOYMENT_WORKERS(self):
+        return self._DEPLOYMENT_WORKERS
+
+    @property
+    def DEPLOYMENT_QUEUE_SIZE(self):
+        return self._DEPLOYMENT_QUEUE_SIZE
+
+    @property
+    def STATUS_WAIT_TIMEOUT(self):
+        return self._STATUS_WAIT_TIMEOUT
+
+    @property
+    def STATUS_POLL_INTERVAL(self):
+        return self._STATUS_POLL_INTERVAL
+
+    @property
+    def PROFILE_CACHE_SIZE(self):
+        return self._PROFILE_CACHE_SIZE
+
+    @property
+    def DEVICE_BATCH_WINDOW(self):
+        return self._DEVICE_BATCH_WINDOW
+
+    @property
+    def AUTH_CACHE_TTL(self):
+        return self._AUTH_CACHE_TTL
+
+    @property
+    def AUTH_CACHE_SIZE(self):
+        return self._AUTH_CACHE_SIZE
+
+    @property
+    def AUTH_GRAPH_CHECK_INTERVAL(self):
+        return self._AUTH_GRAPH_CHECK_INTERVAL
+
     @property
     def ORCH_TIMEOUT(self):
         return self._ORCH_TIMEOUT
 
+    @property
+    def ORCH_CONNECT_TIMEOUT(self):
+        return self._ORCH_CONNECT_TIMEOUT
+
+    @property
+    def ORCH_POOL_SIZE(self):
+        return self._ORCH_POOL_SIZE
+
+    @property
+    def ORCH_RETRIES(self):
+        return self._ORCH_RETRIES
+
+    @property
+    def ORCH_RETRY_BACKOFF(self):
+        return self._ORCH_RETRY_BACKOFF
+
+    @property
+    def TEMPLATE_CACHE_TTL(self):
+        return self._TEMPLATE_CACHE_TTL
+
+    @property
+    def TEMPLATE_CACHE_SIZE(self):
+        return self._TEMPLATE_CACHE_SIZE
+
+    @property
+    def TEMPLATE_FETCH_WORKERS(self):
+        return self._TEMPLATE_FETCH_WORKERS
+
+    @property
+    def ORCH_INCREMENTAL_UPDATE(self):
+        return self._ORCH_INCREMENTAL_UPDATE
+
+    @property
+    def ORCH_DEPLOYED_GRAPH_CACHE_SIZE(self):
+        return self._ORCH_DEPLOYED_GRAPH_CACHE_SIZE
+
+    @property
+    def ORCH_STATUS_CACHE_TTL(self):
+        return self._ORCH_STATUS_CACHE_TTL
+
+    @property
+    def ORCH_STATUS_MIN_TTL(self):
+        return self._ORCH_STATUS_MIN_TTL
+
+    @property
+    def ORCH_STATUS_MAX_TTL(self):
+        return self._ORCH_STATUS_MAX_TTL
+
     @property
     def ISP(self):
         return self._ISP
@@ -183,6 +308,14 @@ class Configuration(object, metaclass=Singleton):
     def DD_KEYFILE(self):
         return self._DD_KEYFILE
 
+    @property
+    def DD_TEMPLATE_TOPIC(self):
+        return self._DD_TEMPLATE_TOPIC
+
+    @property
+    def DD_USER_TOPIC(self):
+        return self._DD_USER_TOPIC
+
     @property
     def DEBUG_MODE(self):
         return self._DEBUG_MODE
@@ -283,6 +416,54 @@ class Configuration(object, metaclass=Singleton):
     def DB_CONNECTION(self):
         return self._DB_CONNECTION
 
+    @property
+    def DB_POOL_SIZE(self):
+        return self._DB_POOL_SIZE
+
+    @property
+    def DB_MAX_OVERFLOW(self):
+        return self._DB_MAX_OVERFLOW
+
+    @property
+    def DB_POOL_TIMEOUT(self):
+        return self._DB_POOL_TIMEOUT
+
+    @property
+    def DB_POOL_RECYCLE(self):
+        return self._DB_POOL_RECYCLE
+
+    @property
+    def DB_POOL_PRE_PING(self):
+        return self._DB_POOL_PRE_PING
+
+    @property
+    def DB_GRAPH_CODEC(self):
+        return self._DB_GRAPH_CODEC
+
+    @property
+    def DB_GRAPH_CACHE_SIZE(self):
+        return self._DB_GRAPH_CACHE_SIZE
+
+    @property
+    def DB_SLOW_QUERY_THRESHOLD(self):
+        return self._DB_SLOW_QUERY_THRESHOLD
+
+    @property
+    def DB_EXPLAIN_SLOW_QUERIES(self):
+        return self._DB_EXPLAIN_SLOW_QUERIES
+
+    @property
+    def DB_ARCHIVE_AFTER(self):
+        return self._DB_ARCHIVE_AFTER
+
+    @property
+    def DB_RETENTION_INTERVAL(self):
+        return self._DB_RETENTION_INTERVAL
+
+    @property
+    def DB_RETENTION_BATCH_SIZE(self):
+        return self._DB_RETENTION_BATCH_SIZE
+
     @property
     def LOG_FILE(self):
         return self._LOG_FILE
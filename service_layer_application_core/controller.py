@@ -8,6 +8,7 @@ from __future__ import division
 import json
 import falcon
 import logging
+import time
 import uuid
 
 from service_layer_application_core.config import Configuration
@@ -15,11 +16,17 @@ from service_layer_application_core.sql.domain import Domain
 from service_layer_application_core.sql.end_point import EndPointDB
 from service_layer_application_core.sql.graph import Graph
 from service_layer_application_core.sql.session import Session, UserDeviceModel
+from service_layer_application_core.sql.session_context import SessionContext
 from service_layer_application_core.sql.user import User
+from service_layer_application_core.sql.sql_server import transaction
 from nffg_library.nffg import NF_FG
 from service_layer_application_core.nffg_manager import NFFG_Manager
+from service_layer_application_core.nffg_clone import clone, copy_into
+from service_layer_application_core.nffg_payload import GraphPayload
 from service_layer_application_core.common.user_session import UserSession
 from service_layer_application_core.common.endpoint import Endpoint
+from service_layer_application_core.common.status_notifier import status_notifier
+from service_layer_application_core.common.profile_cache import lowered_profiles
 from service_layer_application_core.orchestrator_rest import GlobalOrchestrator
 from service_layer_application_core.exception import SessionNotFound, ISPNotDeployed, GraphNotFound
 
@@ -40,6 +47,11 @@ ENRICH_USER_GRAPH = Configuration().ENRICH_USER_GRAPH
 
 DEBUG_MODE = Configuration().DEBUG_MODE
 
+PROFILE_CACHE_SIZE = Configuration().PROFILE_CACHE_SIZE
+
+STATUS_WAIT_TIMEOUT = Configuration().STATUS_WAIT_TIMEOUT
+STATUS_POLL_INTERVAL = Configuration().STATUS_POLL_INTERVAL
+
 VNF_AWARE_DOMAINS = Configuration().VNF_AWARE_DOMAINS
 
 
@@ -70,6 +82,51 @@ class ServiceLayerController:
 
         return json.dumps(status), code
 
+    def wait_status(self, since=None, timeout=None):
+        """
+        Returns the status of the session of the user as soon as it differs from the one already known by the
+        client, waiting for it to change at most timeout seconds
+
+        :param since: the version of the status known by the client, as returned by a previous call
+        :param timeout: maximum seconds to wait, bounded by (and by default) STATUS_WAIT_TIMEOUT
+        :type since: str
+        :type timeout: float
+        :return: the status, as {"session": {"id": ..., "graph_id": ..., "status": ...}, "version": ...,
+                 "changed": ...}, where status is 'not_found' if the user have not a session
+        :rtype: dict
+        """
+        user_id = self.user_data.getUserID()
+        if timeout is None or timeout > STATUS_WAIT_TIMEOUT:
+            timeout = STATUS_WAIT_TIMEOUT
+        deadline = time.time() + timeout
+        keys = (user_id,)
+        while True:
+            # the generations are read before the session, so that no notification can be missed
+            generations = status_notifier.get_generations(keys)
+            status = self._get_status(user_id)
+            remaining = deadline - time.time()
+            if status['version'] != since or remaining <= 0:
+                status['changed'] = status['version'] != since
+                return status
+            session_keys = (user_id, status['session']['id'], status['session']['graph_id'])
+            if session_keys != keys:
+                keys = session_keys
+                continue
+            status_notifier.wait(keys, generations, min(remaining, STATUS_POLL_INTERVAL))
+
+    @staticmethod
+    def _get_status(user_id):
+        user_session = Session.get_user_session_status(user_id)
+        if user_session is None:
+            return {'session': {'id': None, 'graph_id': None, 'status': 'not_found'}, 'version': 'not_found'}
+        session_id, graph_id, status, error, last_update = user_session
+        if error is not None:
+            status = 'error'
+        return {
+            'session': {'id': session_id, 'graph_id': graph_id, 'status': status},
+            'version': session_id + ':' + status + ':' + str(last_update)
+        }
+
     def get_nffg(self):
 
         session = Session().get_active_user_session(self.user_data.getUserID())
@@ -92,86 +149,96 @@ class ServiceLayerController:
         :type nffg: NF_FG
         """
 
-        # Returns the number of active session for the user, and if exists the session for the requested device
-        num_devices, session = Session().get_active_user_device_session(self.user_data.getUserID(),
-                                                                        mac_address,
-                                                                        error_aware=False)
+        # Load the active session of the user, with its devices, once for the whole request
+        session_context = SessionContext.load(self.user_data.getUserID(), error_aware=False)
+        session = session_context.get_session()
+        num_devices = 1
+        if mac_address is not None:
+            # the device must be in the session
+            session_context.get_device(mac_address)
+            num_devices = len(session_context.devices)
 
         if mac_address is not None:
             logging.debug("Delete access for device: "+str(mac_address)+" of User: "+self.user_data.username)
         else:
             logging.debug("Delete user service graph: "+self.user_data.username)
         logging.debug("Number of devices for the user: "+str(num_devices))
-        ended = None
         if num_devices == 1:
             # De-instantiate User Profile Graph
-            if DEBUG_MODE is False:
-                try:
+            try:
+                if DEBUG_MODE is False:
                     self.orchestrator.delete(session.service_graph_id)
+                # close the session in a single transaction
+                with transaction():
                     Graph().delete_session(session.id)
                     Session().delete_user_devices_for_session(session.id)
-                    Session().updateStatus(session.id, 'deleted')
+                    if DEBUG_MODE is False:
+                        Session().updateStatus(session.id, 'deleted')
+                    # Set the field ended in the table session to the actual data time
                     Session().set_ended(session.id)
-                except Exception as err:
-                    Session().set_error(session.id)
-                    raise err
-            else:
-                # debug mode
-                Graph().delete_session(session.id)
-                Session().delete_user_devices_for_session(session.id)
+            except Exception as err:
+                Session().set_error(session.id)
+                raise err
 
             logging.debug('Deleted profile of user "'+self.user_data.username+'"')
             print('Deleted profile of user "' + self.user_data.username + '"')
-
-            # Set the field ended in the table session to the actual data time
-            Session().set_ended(session.id)
         else:
             logging.debug('Delete access for specific device')
 
             # This delete is an update of the user service graph
             # clone the nffg into a service_graph before to start lowering, so we can add it into db if success
-            sl_nffg = NF_FG()
-            sl_nffg.parseDict(nffg.getDict(extended=True, domain=True))
-
-            # delete this device
-            Session().delete_user_device_for_session(session.id, mac_address=mac_address)
+            sl_nffg = clone(nffg)
+            sl_payload = GraphPayload(sl_nffg, extended=True)
 
-            # add old devices
-            self.addDeviceToNF_FG(None, None, nffg)
+            # add old devices, except the one to delete
+            self.addDeviceToNF_FG([], nffg, removed_mac_addresses=[mac_address],
+                                  session_devices=session_context.devices, payload=sl_payload)
 
-            logging.debug('New user profile :'+nffg.getJSON(domain=True))
+            # the graph is serialized once, for the orchestrator and for the logs
+            payload = GraphPayload(nffg)
+            logging.debug('New user profile: %s', payload)
 
             # Call orchestrator to update NF-FG
-            logging.debug('Call orchestrator sending the following NF-FG: '+nffg.getJSON(domain=True))
-            if DEBUG_MODE is False:
-                try:
-                    self.orchestrator.put(nffg)
+            logging.debug('Call orchestrator sending the following NF-FG: %s', payload)
+            try:
+                last_graph = session_context.last_graph
+                deployed_version = None
+                if DEBUG_MODE is False:
+                    # only the differences from the graph currently deployed are sent, if possible
+                    deployed_version = self.orchestrator.update(nffg, last_graph.deployed_version, payload=payload)
+                # delete this device and store the new graph in a single transaction
+                with transaction():
+                    Session().delete_user_device_for_session(session.id, mac_address=mac_address)
                     Session().updateStatus(session.id, 'updated')
-                    Graph.set_service_graph(Graph.get_last_graph(session.id).id, sl_nffg)
-                except Exception as err:
-                    Session().set_error(session.id)
-                    raise err
-            else:
-                # debug mode
-                Session().updateStatus(session.id, 'updated')
-                Graph.set_service_graph(Graph.get_last_graph(session.id).id, sl_nffg)
+                    Graph.set_service_graph(last_graph.id, sl_nffg, deployed_version, payload=sl_payload)
+            except Exception as err:
+                Session().set_error(session.id)
+                raise err
 
             logging.debug('Device deleted "'+mac_address+'" of user "'+self.user_data.username+'"')
             print('Device deleted "' + mac_address + '" of user "' + self.user_data.username + '"')
 
-    def put(self, mac_address=None, device_endpoint_id=None, domain_name=None, nffg=None):
+    def put(self, mac_address=None, device_endpoint_id=None, domain_name=None, nffg=None, devices=None,
+            removed_mac_addresses=()):
         """
 
         :param mac_address:
         :param device_endpoint_id: the id of the end point in the nffg to which the device is attached
         :param domain_name:
         :param nffg:
+        :param devices: the devices to attach, as a list of (mac_address, device_endpoint_id), used in place
+                        of mac_address and device_endpoint_id to attach several devices with a single update
+        :param removed_mac_addresses: the devices to detach from the graph, if it is already instantiated
         :type mac_address: str
         :type device_endpoint_id: str
         :type domain_name: str
         :type nffg: NF_FG
+        :type devices: list
+        :type removed_mac_addresses: list
         :return:
         """
+        if devices is None:
+            devices = [(mac_address, device_endpoint_id)] if mac_address is not None else []
 
         # Get user network function forwarding graph
         if nffg is None:
@@ -184,48 +251,64 @@ class ServiceLayerController:
         if domain_name is not None:
             nffg.domain = domain_name
 
+        # Load the active session of the user, with its last graph and its devices, once for the whole request
+        session_context = SessionContext.load(self.user_data.getUserID())
+
         # Check if the user have an active session
-        if UserSession(self.user_data.getUserID(), self.user_data).checkSession(nffg.id, self.orchestrator) is True:
+        if UserSession(self.user_data.getUserID(), self.user_data)\
+                .checkSession(nffg.id, self.orchestrator, session_context) is True:
             # Existent session for this user
             logging.debug('The FG for this user is already instantiated, the FG will be updated if it has been modified')
 
-            session = Session().get_active_user_session_by_nf_fg_id(nffg.id, error_aware=True)
+            session = session_context.get_session()
+            if session.service_graph_id != nffg.id:
+                session = Session().get_active_user_session_by_nf_fg_id(nffg.id, error_aware=True)
             session_id = session.id
             Session().updateStatus(session_id, 'updating')
 
             # clone the nffg into a service_graph before to start lowering, so we can add it into db if success
-            sl_nffg = NF_FG()
-            sl_nffg.parseDict(nffg.getDict(extended=True, domain=True))
-
-            # Manage new device
-            if Session().checkDeviceSession(self.user_data.getUserID(), mac_address) is True:
-                '''
-                 A rule for this mac address is already implemented,
-                 only an update of the graph is needed
-                 (This update is necessary only if the graph is different from the last instantiated,
-                 but in this moment the graph is always re-instantiated, will be the orchestrator accountable
-                 for a smart update of the FG).
-                '''
-                mac_address = None
-
-            self.addDeviceToNF_FG(mac_address, device_endpoint_id, nffg)
+            sl_nffg = clone(nffg)
+            sl_payload = GraphPayload(sl_nffg, extended=True)
+
+            # Manage new devices
+            '''
+             If a rule for a mac address is already implemented,
+             only an update of the graph is needed
+             (This update is necessary only if the graph is different from the last instantiated,
+             but in this moment the graph is always re-instantiated: only its differences from the graph
+             currently deployed are sent to the orchestrator, if it supports patches).
+            '''
+            new_devices = [device for device in self._getUserDevices(devices, nffg)
+                           if not session_context.has_device(device.mac_address)]
+
+            self.addDeviceToNF_FG(new_devices, nffg, removed_mac_addresses=removed_mac_addresses,
+                                  session_devices=session_context.devices, payload=sl_payload)
 
             # Call orchestrator to update NF-FG
-            logging.debug('Call orchestrator sending the following NF-FG: '+nffg.getJSON(domain=True))
-            if DEBUG_MODE is False:
-                try:
-                    self.orchestrator.put(nffg)
-                    Graph.set_service_graph(Graph.get_last_graph(session_id).id, sl_nffg)
-                except Exception as err:
-                    Session().set_error(session_id)
-                    raise err
-            else:
-                # debug mode
-                Graph.set_service_graph(Graph.get_last_graph(session_id).id, sl_nffg)
-            if mac_address is not None:
-                logging.info("Added device '"+mac_address+"' of user '"+self.user_data.username+"'")
-                print("Added device '"+mac_address+"' of user '"+self.user_data.username+"'")
-            else:
+            payload = GraphPayload(nffg)
+            logging.debug('Call orchestrator sending the following NF-FG: %s', payload)
+            try:
+                last_graph = session_context.last_graph
+                if session_context.session is not session:
+                    last_graph = Graph.get_last_graph(session_id)
+                deployed_version = None
+                if DEBUG_MODE is False:
+                    # only the differences from the graph currently deployed are sent, if possible
+                    deployed_version = self.orchestrator.update(nffg, last_graph.deployed_version, payload=payload)
+                # store the new graph and the device in a single transaction
+                with transaction():
+                    Graph.set_service_graph(last_graph.id, sl_nffg, deployed_version, payload=sl_payload)
+                    self._completeSession(session_id, new_devices, removed_mac_addresses)
+            except Exception as err:
+                Session().set_error(session_id)
+                raise err
+            for removed_mac_address in removed_mac_addresses:
+                logging.info("Deleted device '"+removed_mac_address+"' of user '"+self.user_data.username+"'")
+                print("Deleted device '"+removed_mac_address+"' of user '"+self.user_data.username+"'")
+            for device in new_devices:
+                logging.info("Added device '"+device.mac_address+"' of user '"+self.user_data.username+"'")
+                print("Added device '"+device.mac_address+"' of user '"+self.user_data.username+"'")
+            if not new_devices and not removed_mac_addresses:
                 logging.info("User profile updated '"+self.user_data.username+"'")
                 print("User profile updated '"+self.user_data.username+"'")
         else:
@@ -236,7 +319,8 @@ class ServiceLayerController:
             Session().inizializeSession(session_id, self.user_data.getUserID(), nffg.id, nffg.name)
 
             # set the domain in root if available in endpoint
-            if device_endpoint_id is not None and domain_name is None:
+            if devices and domain_name is None:
+                device_endpoint_id = devices[0][1]
                 logging.info("Detecting the right domain for the user graph")
                 logging.debug("device_endpoint_id: " + device_endpoint_id)
                 ep_domain_name = EndPointDB.get_end_point(nffg.getEndPoint(device_endpoint_id).db_id).domain_name
@@ -247,64 +331,93 @@ class ServiceLayerController:
                     nffg.domain = EndPointDB.get_end_point(nffg.getEndPoint(device_endpoint_id).db_id).domain_name
 
             # clone the nffg into a service_graph before to start lowering, so we can add it into db if success
-            sl_nffg = NF_FG()
-            sl_nffg.parseDict(nffg.getDict(extended=True, domain=True))
+            sl_nffg = clone(nffg)
+            sl_payload = GraphPayload(sl_nffg, extended=True)
 
             # Manage profile
-            logging.debug("User service graph: "+nffg.getJSON(domain=True))
-            self.prepareProfile(mac_address, device_endpoint_id, nffg)
+            logging.debug("User service graph: %s", sl_payload)
+            new_devices = self._getUserDevices(devices, nffg)
+            self.prepareProfile(new_devices, nffg, payload=sl_payload)
 
             # Call orchestrator to instantiate NF-FG
-            logging.debug('Calling orchestrator sending NF-FG: '+nffg.getJSON(domain=True))
+            payload = GraphPayload(nffg)
+            logging.debug('Calling orchestrator sending NF-FG: %s', payload)
             print("Calling orchestrator to instantiate '"+self.user_data.username+"' forwarding graph.")
-            if DEBUG_MODE is False:
-                try:
-                    self.orchestrator.put(nffg)
-                    # add the service graph to db
-                    graph_db_id = Graph().add_graph(sl_nffg, session_id)
+            try:
+                deployed_version = None
+                if DEBUG_MODE is False:
+                    deployed_version = self.orchestrator.update(nffg, payload=payload)
+                # add the service graph to db along with the device, in a single transaction
+                with transaction():
+                    graph_db_id = Graph().add_graph(sl_nffg, session_id, deployed_version=deployed_version,
+                                                    payload=sl_payload)
                     if domain_name is not None:
                         Graph.set_domain_id(graph_db_id, Domain.get_domain_from_name(domain_name).id)
-                    logging.debug("Profile instantiated for user '"+self.user_data.username+"'")
-                    print("Profile instantiated for user '"+self.user_data.username+"'")
-                except Exception as err:
-                    logging.exception(err)
-                    Session().set_error(session_id)
-                    Graph.delete_graph(session_id)
-                    logging.debug("Failed to instantiated profile for user '"+self.user_data.username+"'")
-                    print("Failed to instantiated profile for user '"+self.user_data.username+"'")
-                    raise err
-            else:
-                # debug mode
-                graph_db_id = Graph().add_graph(sl_nffg, session_id)
-                if domain_name is not None:
-                    Graph.set_domain_id(graph_db_id, Domain.get_domain_from_name(domain_name).id)
+                    self._completeSession(session_id, new_devices)
                 logging.debug("Profile instantiated for user '"+self.user_data.username+"'")
                 print("Profile instantiated for user '"+self.user_data.username+"'")
+            except Exception as err:
+                logging.exception(err)
+                Session().set_error(session_id)
+                logging.debug("Failed to instantiated profile for user '"+self.user_data.username+"'")
+                print("Failed to instantiated profile for user '"+self.user_data.username+"'")
+                raise err
+
+    @staticmethod
+    def _getUserDevices(devices, nffg):
+        """
+        :param devices: list of (mac_address, device_endpoint_id)
+        :return: the devices as models, with the db id of their end point
+        :rtype: list of UserDeviceModel
+        """
+        return [UserDeviceModel(mac_address=mac_address,
+                                endpoint_id=device_endpoint_id,
+                                endpoint_db_id=nffg.getEndPoint(device_endpoint_id).db_id)
+                for mac_address, device_endpoint_id in devices]
 
-        # Set mac address in the session
-        if mac_address is not None:
+    @staticmethod
+    def _completeSession(session_id, new_devices, removed_mac_addresses=()):
+        """
+        Set the mac addresses of the new devices (if any) in the session, remove the ones of the detached
+        devices and mark the session as complete.
+        It is meant to be called in the same transaction that stores the deployed graph.
+        """
+        for mac_address in removed_mac_addresses:
+            Session().delete_user_device_for_session(session_id, mac_address=mac_address)
+        for device in new_devices:
             Session().add_device_in_the_session(
-                mac_address,
-                device_endpoint_id,
-                nffg.getEndPoint(device_endpoint_id).db_id,
+                device.mac_address,
+                device.endpoint_id,
+                device.endpoint_db_id,
                 session_id
             )
         Session().updateStatus(session_id, 'complete')
 
-    def addDeviceToNF_FG(self, mac_address, device_endpoint_id, nffg):
+    def addDeviceToNF_FG(self, new_devices, nffg, removed_mac_addresses=(), session_devices=None, payload=None):
+        """
+        Add to the nffg the ingress flows of the devices already in the session and of the new ones
+
+        :param new_devices: devices to attach to the graph
+        :param nffg: the graph to prepare
+        :param removed_mac_addresses: devices of the session that must not be attached anymore
+        :param session_devices: the devices already in the session, if already loaded
+        :param payload: the extended payload of the nffg as passed, if already serialized
+        :type new_devices: list of UserDeviceModel
+        :type nffg: NF_FG
+        :type removed_mac_addresses: list
+        :type session_devices: list of UserDeviceModel
+        :type payload: GraphPayload
+        """
         # Get MAC addresses from previous session
         logging.debug('Get MAC addresses from previous session')
-        session_devices = Session().get_active_user_devices(self.user_data.getUserID())
+        if session_devices is None:
+            session_devices = Session().get_active_user_devices(self.user_data.getUserID())
         user_devices = []
         if session_devices is not None:
-            user_devices = user_devices + session_devices
-        if mac_address is not None:
-            logging.debug('new MAC: '+str(mac_address))
-            user_devices.append(UserDeviceModel(
-                mac_address=mac_address,
-                endpoint_id=device_endpoint_id,
-                endpoint_db_id=nffg.getEndPoint(device_endpoint_id).db_id
-            ))
+            user_devices = [device for device in session_devices if device.mac_address not in removed_mac_addresses]
+        for device in new_devices:
+            logging.debug('new MAC: '+str(device.mac_address))
+            user_devices.append(device)
         logging.debug('User devices: '+str(user_devices))
 
         # TODO I think that this fabio's check is wronged so I pass always 'False' for now
@@ -314,14 +427,14 @@ class ServiceLayerController:
         else:
             already_connected = False
 
-        self._prepareProfile(nffg, already_connected=False)
+        self._prepareProfile(nffg, already_connected=False, payload=payload)
 
         # add ingress flows for all devices (old and news)
         if len(user_devices) != 0:
             manager = NFFG_Manager(nffg)
             manager.addDevicesFlows(user_devices)
 
-    def _prepareProfile(self, nffg, already_connected=False):
+    def _prepareProfile(self, nffg, already_connected=False, payload=None):
         """
         This method performs the following modification to the graph passed as argument:
          if it is an user graph, ingress and egress graph are attached;
@@ -329,11 +442,24 @@ class ServiceLayerController:
          the graph is attached to the ISP;
          useless VNFs are merged;
          each endpoint is characterized, so the type and relative details are added.
+        The prepared graphs are cached: a graph equal to one already prepared gets a copy of the result.
 
         :param nffg: the graph to prepare
         :param already_connected:
+        :param payload: the extended payload of the graph to prepare, if already serialized
+        :type payload: GraphPayload
         :return:
         """
+        profile_key = None
+        if PROFILE_CACHE_SIZE > 0:
+            profile_key = self._getProfileKey(nffg, payload)
+            lowered_nffg = lowered_profiles.get(profile_key)
+            if lowered_nffg is not None:
+                logging.debug("Graph '" + nffg.id + "' already prepared, got from cache")
+                copy_into(nffg, lowered_nffg)
+                return
+        # resources used to prepare the graph: when one of them changes the graph has to be prepared again
+        dependencies = set()
 
         manager = NFFG_Manager(nffg)
 
@@ -357,9 +483,16 @@ class ServiceLayerController:
 
         # Add control network
         logging.debug('Adding control network')
+        # get in parallel the templates of all the vnfs of the graph
+        templates = self.orchestrator.getTemplates([vnf.vnf_template_location for vnf in nffg.vnfs])
         for vnf in nffg.vnfs:
             logging.debug('Getting template for vnf: ' + vnf.name + ' (file ' + vnf.vnf_template_location + ')')
-            template = self.orchestrator.getTemplate(vnf.vnf_template_location)
+            if vnf.vnf_template_location in templates:
+                template = templates[vnf.vnf_template_location]
+            else:
+                # vnf added while preparing the graph (i.e. the control switch)
+                template = self.orchestrator.getTemplate(vnf.vnf_template_location)
+            dependencies.add(('template', vnf.vnf_template_location))
             need_control_net, port = manager.checkIfControlNetIsNedeed(vnf, template)
             if need_control_net is True:
                 if ISP is True and nffg.name != 'ISP_graph':
@@ -368,7 +501,7 @@ class ServiceLayerController:
                     control_switch = manager.addPortToControlNet(vnf, port.id, ISP_EGRESS)
 
                 if nffg.name == 'ISP_graph':
-                    user_control_egress = manager.createEndPoint(CONTROL_INGRESS)
+                    user_control_egress = manager.createEndPoint(CONTROL_INGRESS, seed=vnf.id)
                     port = manager.createSwitchPort(control_switch)
                     control_switch.ports.append(port)
                     manager.connectVNFAndEndPoint(vnf_id=control_switch.id, port_id=port.id, end_point_id=user_control_egress.id)
@@ -381,32 +514,53 @@ class ServiceLayerController:
 
         manager.mergeUselessVNFs()
 
-        Endpoint(nffg).characterizeEndpoint(User().getUser(self.user_data.username).id)
+        Endpoint(nffg).characterizeEndpoint(self.user_data.getUserID())
+
+        if profile_key is not None:
+            dependencies.update(('end_point', str(end_point.db_id)) for end_point in nffg.end_points
+                                if end_point.db_id is not None)
+            lowered_profiles.put(profile_key, nffg, dependencies)
 
-    def prepareProfile(self, mac_address, device_endpoint_id, nffg):
+    @staticmethod
+    def _getProfileKey(nffg, payload=None):
+        """
+        Returns the key identifying the inputs from which the graph is prepared: its content and,
+        if it is enriched, the versions of the ingress and egress graphs
+
+        :rtype: tuple
+        """
+        if payload is None:
+            payload = GraphPayload(nffg, extended=True)
+        profile_key = (payload.version,)
+        if ENRICH_USER_GRAPH and nffg.name != 'Authentication-Graph' and nffg.name != 'ISP-Graph':
+            profile_key += NFFG_Manager.getIngressEgressVersion()
+        return profile_key
+
+    def prepareProfile(self, user_devices, nffg, payload=None):
         """
         This function transform the Service Graph passed to a Forwarding Graph.
-        In addiction adds the flow rule for the user device.
+        In addiction adds the flow rules for the user devices.
 
-        :param mac_address: if specified, an ingress flow rule for this device will be added to the nffg
-        :param device_endpoint_id:
+        :param user_devices: an ingress flow rule for each of these devices will be added to the nffg
         :param nffg: the graph to prepare
+        :param payload: the extended payload of the graph to prepare, if already serialized
+        :type user_devices: list of UserDeviceModel
+        :type payload: GraphPayload
         :return:
         """
         # Transform profile in NF_FG
         manager = NFFG_Manager(nffg)
 
-        self._prepareProfile(nffg)
+        self._prepareProfile(nffg, payload=payload)
 
         # Add flow that permits to user device to reach his NF-FG  
-        if mac_address is not None:
-            logging.debug('Adding device flows for mac address: ' + str(mac_address))
-            user_device = UserDeviceModel(
-                mac_address=mac_address,
-                endpoint_id=device_endpoint_id,
-                endpoint_db_id=nffg.getEndPoint(device_endpoint_id).db_id
-            )
-            manager.setDeviceFlows(user_device)
+        if len(user_devices) == 1:
+            logging.debug('Adding device flows for mac address: ' + str(user_devices[0].mac_address))
+            manager.setDeviceFlows(user_devices[0])
+        elif len(user_devices) > 1:
+            logging.debug('Adding device flows for mac addresses: ' +
+                          str([device.mac_address for device in user_devices]))
+            manager.addDevicesFlows(user_devices)
         else:
             logging.warning("No mac address specified for this request (user '" + self.user_data.username + "')")
 
@@ -10,12 +10,17 @@ import json
 
 from service_layer_application_core.config import Configuration
 from service_layer_application_core.isp_graph_manager import ISPGraphManager
+from service_layer_application_core.orchestrator_rest import invalidate_template
+from service_layer_application_core.user_authentication import invalidate_user
 from .domain_info import DomainInfo
 from .sql.domain import Domain
 from .sql.domains_info import DomainInformation
+from .sql.sql_server import remove_session
 from .authentication_graph_manager import AuthGraphManager
 
 BLIND_ISP_DEPLOYMENT = Configuration().BLIND_ISP_DEPLOYMENT
+DD_TEMPLATE_TOPIC = Configuration().DD_TEMPLATE_TOPIC
+DD_USER_TOPIC = Configuration().DD_USER_TOPIC
 
 class DDClient(ClientSafe):
 
@@ -35,6 +40,7 @@ class DDClient(ClientSafe):
             if self.isp_graph_manager.is_instantiated() and not self.auth_graph_manager.is_instantiated():
                 self.auth_graph_manager.instantiate_auth_graph()
         self.detached_domains = []
+        remove_session()
 
     def on_data(self, dst, msg):
         print(dst, " sent", msg)
@@ -48,6 +54,17 @@ class DDClient(ClientSafe):
         print(msg_str)
         # TODO validate message
 
+        if isinstance(topic, bytes):
+            topic = topic.decode("utf-8")
+        if DD_TEMPLATE_TOPIC and topic.startswith(DD_TEMPLATE_TOPIC):
+            # a template has been changed, so the cached one is outdated
+            invalidate_template(msg.decode("utf-8").strip())
+            return
+        if DD_USER_TOPIC and topic.startswith(DD_USER_TOPIC):
+            # a user or a tenant has been changed, so its cached authentication is outdated
+            invalidate_user(msg.decode("utf-8").strip())
+            return
+
         try:
             domain = src.decode("utf-8")
             domain_info = json.loads(msg.decode("utf-8"))
@@ -83,6 +100,9 @@ class DDClient(ClientSafe):
 
         except Exception as ex:
             logging.exception(ex)
+        finally:
+            # this thread lives for the whole process, do not keep db state among messages
+            remove_session()
 
     # dd ClientSafe call this method without src and msg parameters, so if i override correctly with
     # this parameters (as requested from ClientInterface), there will be an error at any registration
@@ -91,6 +111,10 @@ class DDClient(ClientSafe):
     def on_reg(self):
         logging.info("Doubledecker Client State: connected")
         self.subscribe("frog:domain-description", "/0/0/0/")
+        if DD_TEMPLATE_TOPIC:
+            self.subscribe(DD_TEMPLATE_TOPIC, "/0/0/0/")
+        if DD_USER_TOPIC:
+            self.subscribe(DD_USER_TOPIC, "/0/0/0/")
 
     def unsubscribe(self, topic, scope):
         pass
@@ -0,0 +1,415 @@
+"""
+Created on Oct 18, 2026
+
+Deployment of user graphs.
+The device logins and logouts of a user arriving within a short window are deployed together,
+with a single update of its graph. When the service layer runs in asynchronous mode the REST
+requests only validate and enqueue the deployment, that is then performed by a bounded pool of
+worker threads.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from requests import HTTPError
+
+from service_layer_application_core.config import Configuration
+from service_layer_application_core.common.cache import LRUCache
+from service_layer_application_core.controller import ServiceLayerController
+from service_layer_application_core.client_graph_manager import ClientGraphManager
+from service_layer_application_core.exception import DeploymentQueueFull, SessionNotFound
+from service_layer_application_core.sql.session import Session
+from service_layer_application_core.sql.sql_server import remove_session
+from service_layer_application_core import metrics
+
+DEPLOYMENT_WORKERS = Configuration().DEPLOYMENT_WORKERS
+DEPLOYMENT_QUEUE_SIZE = Configuration().DEPLOYMENT_QUEUE_SIZE
+DEVICE_BATCH_WINDOW = Configuration().DEVICE_BATCH_WINDOW
+# how long the status of a finished job can be requested
+JOB_RETENTION = 3600
+
+
+def deploy_user_graph(user_data, device=None):
+    """
+    Deploys the graph of the user, attaching to it the device if specified
+
+    :param user_data: the owner of the graph
+    :param device: the device to attach, as {"mac": "fc:4d:e2:56:9f:19", "port": "eth4"}
+    :type user_data: UserData
+    :type device: dict
+    """
+    if device is not None:
+        device_batcher.deploy(user_data, DeviceRequest('add', device['mac'], device['port']))
+    else:
+        device_batcher.deploy(user_data, DeviceRequest('update'))
+
+
+def undeploy_user_device(user_data, mac_address):
+    """
+    Detaches the device from the graph of the user, de-instantiating the graph if it was the last one
+
+    :param user_data: the owner of the graph
+    :param mac_address: the mac address of the device
+    :type user_data: UserData
+    :type mac_address: str
+    """
+    device_batcher.deploy(user_data, DeviceRequest('remove', mac_address))
+
+
+def deploy_device_requests(user_data, requests):
+    """
+    Deploys the device requests of the user with a single update of its graph.
+    Requests that can not be applied to the graph are completed with their own error, the others with the
+    outcome of the update, that is returned raising its error if it failed.
+
+    :param user_data: the owner of the graph
+    :param requests: the requests to deploy, in the order they arrived
+    :type user_data: UserData
+    :type requests: list of DeviceRequest
+    """
+    # only the last request of each device is deployed, the previous ones get its same outcome
+    device_requests = OrderedDict()
+    for request in requests:
+        device_requests.setdefault(request.mac_address, []).append(request)
+    # requests without device (i.e. plain updates) are satisfied by any update of the graph
+    updates = device_requests.pop(None, [])
+
+    controller = ServiceLayerController(user_data)
+    if not device_requests:
+        controller.put()
+        return
+
+    graph_manager = ClientGraphManager(user_data)
+    session_mac_addresses = [device.mac_address for device in
+                             Session().get_active_user_devices(graph_manager.user_id)]
+
+    # detach the devices that logged out
+    removed_mac_addresses = []
+    for mac_address, mac_requests in device_requests.items():
+        if mac_requests[-1].action != 'remove':
+            continue
+        if mac_address not in session_mac_addresses and any(r.action == 'add' for r in mac_requests):
+            # logged in and out in the same batch, there is nothing to deploy
+            _complete(mac_requests)
+            continue
+        try:
+            graph_manager.delete_endpoint_from_user_device_if_last(mac_address, removed_mac_addresses)
+        except Exception as err:
+            _complete(mac_requests, err)
+            continue
+        removed_mac_addresses.append(mac_address)
+
+    # attach the devices that logged in, adding a new endpoint to the graph for the ones coming from a new port
+    devices = []
+    for mac_address, mac_requests in device_requests.items():
+        if mac_requests[-1].action != 'add':
+            continue
+        try:
+            if not devices:
+                graph_manager.prepare_egress_end_point()
+            device_endpoint_id = graph_manager.add_endpoint_from_auth_switch_interface(mac_requests[-1].port)
+        except Exception as err:
+            _complete(mac_requests, err)
+            continue
+        devices.append((mac_address, device_endpoint_id))
+
+    # send a single request to controller
+    if devices or removed_mac_addresses:
+        if not devices and len(removed_mac_addresses) == len(session_mac_addresses):
+            # all the devices logged out
+            controller.delete(None, graph_manager.nffg)
+        else:
+            controller.put(nffg=graph_manager.nffg, devices=devices, removed_mac_addresses=removed_mac_addresses)
+    elif updates:
+        controller.put()
+
+
+def _complete(requests, error=None):
+    for request in requests:
+        request.complete(error)
+
+
+class DeviceRequest(object):
+    """
+    A device login (add) or logout (remove) of a user, or an update of its graph without devices (update),
+    waiting to be deployed within a batch
+    """
+
+    def __init__(self, action, mac_address=None, port=None):
+        self.action = action
+        self.mac_address = mac_address
+        self.port = port
+        self.error = None
+        self.done = threading.Event()
+
+    def complete(self, error=None):
+        if not self.done.is_set():
+            self.error = error
+            self.done.set()
+
+
+class DeviceBatcher(object):
+    """
+    Collects the device requests of each user arriving within a short window, and deploys them with a
+    single update of the user graph (i.e. a single PUT to the orchestrator).
+    The first request of a batch waits for the window to elapse (if any) and for the previous batch of the same
+    user to be deployed, then deploys the whole batch in its own thread; each caller gets back the outcome of its
+    own request. So, without a window, only the requests arriving while the user has a batch in flight wait.
+    """
+
+    def __init__(self, window=DEVICE_BATCH_WINDOW):
+        self.window = window
+        self._batches = {}
+        # username -> [lock, number of batches holding or waiting for it], removed when no batch needs it
+        self._user_locks = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+
+    def deploy(self, user_data, request):
+        """
+        Deploys the request within the current batch of the user, waiting for its outcome
+
+        :type user_data: UserData
+        :type request: DeviceRequest
+        :raise: the error that made fail the request
+        """
+        with self._lock:
+            self.requests += 1
+            batch = self._batches.get(user_data.username)
+            leader = batch is None
+            if leader:
+                batch = self._batches[user_data.username] = []
+            batch.append(request)
+
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._user_lock(user_data.username):
+                with self._lock:
+                    # requests arriving from now on will be deployed with the next batch
+                    del self._batches[user_data.username]
+                    self.batches += 1
+                if len(batch) > 1:
+                    logging.debug("Deploying " + str(len(batch)) + " device requests of user '" +
+                                  user_data.username + "' with a single update")
+                try:
+                    deploy_device_requests(user_data, batch)
+                except Exception as err:
+                    _complete(batch, err)
+                else:
+                    _complete(batch)
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+
+    @contextmanager
+    def _user_lock(self, username):
+        with self._lock:
+            entry = self._user_locks.get(username)
+            if entry is None:
+                entry = self._user_locks[username] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._user_locks[username]
+
+    def getDict(self):
+        with self._lock:
+            return {
+                'window': self.window,
+                'requests': self.requests,
+                'batches': self.batches,
+                'pending_users': len(self._batches),
+                'locked_users': len(self._user_locks)
+            }
+
+
+class DeploymentJob(object):
+    """
+    A deployment requested for a user graph, and its current status
+    (queued, in_progress, complete or error)
+    """
+
+    def __init__(self, user_data, device=None):
+        self.id = uuid.uuid4().hex
+        self.user_data = user_data
+        self.device = device
+        self.status = 'queued'
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.ended_at = None
+        # the session marked in progress when the job has been submitted, and its status before
+        self.session_id = None
+        self.previous_session_status = None
+        self.done = threading.Event()
+
+    @property
+    def key(self):
+        """
+        Jobs having the same key request the same deployment
+        """
+        if self.device is None:
+            return self.user_data.username, None, None
+        return self.user_data.username, self.device['mac'], self.device['port']
+
+    def getDict(self):
+        job_dict = {'id': self.id, 'user': self.user_data.username, 'status': self.status,
+                    'created_at': self.created_at}
+        if self.device is not None:
+            job_dict['device'] = self.device
+        if self.started_at is not None:
+            job_dict['started_at'] = self.started_at
+        if self.ended_at is not None:
+            job_dict['ended_at'] = self.ended_at
+        if self.error is not None:
+            job_dict['error'] = self.error
+        return job_dict
+
+
+class DeploymentQueue(object):
+    """
+    Bounded queue of deployment jobs, served by a pool of worker threads.
+    A request equal to one still queued is coalesced with it, while jobs of the same user run by
+    different workers are deployed together by the device batcher.
+    Jobs are kept in the memory of the process that accepted them.
+    """
+
+    def __init__(self, workers=DEPLOYMENT_WORKERS, queue_size=DEPLOYMENT_QUEUE_SIZE):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = LRUCache(max(queue_size * 10, 1024), ttl=JOB_RETENTION)
+        self._pending = {}
+        # places of the queue taken by the jobs being submitted
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        self.coalesced = 0
+        self.rejected = 0
+
+    def submit(self, user_data, device=None):
+        """
+        Enqueues the deployment of the user graph
+
+        :return: the job tracking the deployment
+        :rtype: DeploymentJob
+        :raise DeploymentQueueFull: if too many deployments are waiting
+        """
+        job = DeploymentJob(user_data, device)
+        with self._lock:
+            self._start_workers()
+            pending_job = self._pending.get(job.key)
+            if pending_job is not None:
+                self.coalesced += 1
+                logging.debug("Deployment request coalesced with job " + pending_job.id)
+                return pending_job
+            # the place in the queue is reserved, the job is enqueued once the session is marked
+            if self._queue.qsize() + self._reserved >= self._queue.maxsize > 0:
+                self.rejected += 1
+                raise DeploymentQueueFull("Too many deployments in progress, retry later")
+            self._reserved += 1
+            self._pending[job.key] = job
+            self._jobs.put(job.id, job)
+        try:
+            # marked before a worker can get the job, so that its result is never overwritten
+            self._mark_in_progress(job)
+        except Exception as err:
+            logging.exception(err)
+        with self._lock:
+            self._reserved -= 1
+            self._queue.put_nowait(job)
+        logging.debug("Deployment job " + job.id + " queued for user '" + user_data.username + "'")
+        return job
+
+    def get_job(self, job_id):
+        """
+        :rtype: DeploymentJob
+        """
+        return self._jobs.get(job_id)
+
+    def _start_workers(self):
+        # threads are started at the first request, so that they are not lost if the process is forked
+        if not self._threads:
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name="deployment-worker-" + str(index), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    @staticmethod
+    def _mark_in_progress(job):
+        # if the user have already a session, its status is updated immediately
+        try:
+            session = Session().get_active_user_session(job.user_data.getUserID())
+        except SessionNotFound:
+            return
+        job.session_id = session.id
+        job.previous_session_status = session.status
+        Session().updateStatus(session.id, 'in_progress')
+
+    @staticmethod
+    def _restore_session_status(job):
+        # a job failed, or with nothing to deploy, leaves the session as it was before it was submitted
+        if job.session_id is not None:
+            Session().restore_status(job.session_id, 'in_progress', job.previous_session_status)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self._lock:
+                    # from now on an equal request can not be coalesced with this job
+                    self._pending.pop(job.key, None)
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _run(job):
+        job.status = 'in_progress'
+        job.started_at = time.time()
+        try:
+            deploy_user_graph(job.user_data, job.device)
+            job.status = 'complete'
+            logging.debug("Deployment job " + job.id + " completed")
+        except HTTPError as err:
+            logging.exception(err)
+            job.status = 'error'
+            job.error = "Orchestrator error (" + str(err.response.status_code) + "): " + err.response.text
+        except Exception as err:
+            logging.exception(err)
+            job.status = 'error'
+            job.error = str(err)
+        finally:
+            try:
+                DeploymentQueue._restore_session_status(job)
+            except Exception as err:
+                logging.exception(err)
+            job.ended_at = time.time()
+            job.done.set()
+            remove_session()
+
+    def getDict(self):
+        return {
+            'workers': self.workers,
+            'queued': self._queue.qsize(),
+            'max_queued': self._queue.maxsize,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected
+        }
+
+device_batcher = DeviceBatcher()
+metrics.register('device_batcher', device_batcher.getDict)
+
+deployment_queue = DeploymentQueue()
+metrics.register('deployment_queue', deployment_queue.getDict)
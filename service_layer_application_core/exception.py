@@ -153,3 +153,13 @@ class EndPointIdNotFound(Exception):
 
     def get_mess(self):
         return self.message
+
+
+class DeploymentQueueFull(Exception):
+    def __init__(self, message):
+        self.message = message
+        # Call the base class constructor with the parameters it needs
+        super(DeploymentQueueFull, self).__init__(message)
+
+    def get_mess(self):
+        return self.message
@@ -171,6 +171,5 @@ class ISPGraphManager:
     def get_current_instance(self):
         # get current instance of isp service-graph
         session_id = Session().get_active_user_session(self.isp_id).id
-        nffg = NF_FG()
-        nffg.parseDict(json.loads(Graph.get_last_graph(session_id).service_graph))
+        nffg = Graph.get_last_service_graph(session_id)
         return nffg
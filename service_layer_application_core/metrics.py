@@ -0,0 +1,72 @@
+"""
+Created on Oct 18, 2026
+
+Process-wide registry of the runtime metrics exported by the components of the service layer.
+"""
+import threading
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def register(name, provider):
+    """
+    Register a metrics provider
+
+    :param name: name under which the metrics of the component are exported
+    :param provider: callable without arguments returning a json serializable dict
+    :type name: str
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def collect():
+    """
+    Collect the metrics of all the registered components
+
+    :return: a dict containing, for each registered component, its current metrics
+    :rtype: dict
+    """
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
+
+
+class Histogram(object):
+    """
+    Distribution of the observed values (e.g. latencies in seconds) among fixed buckets.
+    As in Prometheus, each bucket counts the observations less than or equal to its upper bound.
+    """
+
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+
+    def getDict(self):
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self._counts)}
+            buckets['+Inf'] = self.count
+            return {
+                'count': self.count,
+                'sum': self.sum,
+                'max': self.max,
+                'avg': self.sum / self.count if self.count else 0.0,
+                'buckets': buckets
+            }
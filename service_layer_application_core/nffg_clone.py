@@ -0,0 +1,50 @@
+"""
+Created on Oct 18, 2026
+
+Structural clone of the NF-FG object model (NF_FG, VNF, Port, EndPoint, FlowRule, Match, Action, ...).
+"""
+import copy
+
+# values that are never modified in place, so they can be shared between a graph and its clones
+_IMMUTABLE_TYPES = frozenset([str, int, float, bool, bytes, type(None)])
+
+
+def copy_into(target, source):
+    """
+    Replaces in place the content of an element with a clone of the content of another element of the same type,
+    so that the references to the target held by the callers see the new content
+    """
+    source_copy = clone(source)
+    target.__dict__.clear()
+    target.__dict__.update(source_copy.__dict__)
+
+
+def clone(element, _memo=None):
+    """
+    Returns a copy of a graph, or of one of its elements, owning all its children: nested elements, lists
+    and dicts are copied, while the immutable values (ids, names, addresses...) are shared with the original.
+    Unlike copy.deepcopy, the elements are copied attribute by attribute, without serializing them.
+
+    :param element: the element to copy
+    :return: the copy of the element
+    """
+    element_type = type(element)
+    if element_type in _IMMUTABLE_TYPES:
+        return element
+    if _memo is None:
+        _memo = {}
+    if element_type is list:
+        return [clone(item, _memo) for item in element]
+    if element_type is dict:
+        return {key: clone(value, _memo) for key, value in element.items()}
+    if element_type is tuple:
+        return tuple(clone(item, _memo) for item in element)
+    if hasattr(element, '__dict__'):
+        # an element referenced twice in the graph is copied once
+        element_copy = _memo.get(id(element))
+        if element_copy is None:
+            element_copy = element_type.__new__(element_type)
+            _memo[id(element)] = element_copy
+            element_copy.__dict__.update({name: clone(value, _memo) for name, value in element.__dict__.items()})
+        return element_copy
+    return copy.deepcopy(element, {})
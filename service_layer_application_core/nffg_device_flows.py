@@ -0,0 +1,109 @@
+"""
+Created on Oct 18, 2026
+
+Flow rules of the user devices, stamped out from the flow rules of the end points they are connected to.
+"""
+import copy
+
+from service_layer_application_core.nffg_ids import derived_id
+from service_layer_application_core.nffg_index import FlowRuleIndex
+
+DEVICE_FLOW_PRIORITY = 1000
+
+
+def device_flow_id(flow_rule_id, mac_field, mac_address):
+    """
+    Returns the id of the rule of a device derived from a flow rule of its end point. The id only depends on
+    its inputs, so the rules of the devices already deployed keep their ids when the graph is updated.
+
+    :param flow_rule_id: the id of the flow rule of the end point
+    :param mac_field: 'source_mac' or 'dest_mac'
+    :param mac_address: the mac address of the device
+    :rtype: str
+    """
+    return derived_id(flow_rule_id, mac_field, mac_address)
+
+
+class DeviceFlowTemplate(object):
+    """
+    A flow rule of an end point, from which the rules of its devices are stamped out: they only differ from it
+    by the id, the priority and the mac address matched.
+    """
+
+    def __init__(self, flow_rule, mac_field):
+        """
+
+        :param flow_rule: the flow rule of the end point, no longer in the graph
+        :param mac_field: the field of the match set to the mac address of the devices
+        :type flow_rule: FlowRule
+        :type mac_field: str
+        """
+        self.flow_rule = flow_rule
+        self.mac_field = mac_field
+
+    def stamp(self, mac_address):
+        """
+        :rtype: FlowRule
+        """
+        flow_rule = copy.copy(self.flow_rule)
+        flow_rule.id = device_flow_id(self.flow_rule.id, self.mac_field, mac_address)
+        flow_rule.priority = DEVICE_FLOW_PRIORITY
+        flow_rule.match = copy.copy(self.flow_rule.match)
+        setattr(flow_rule.match, self.mac_field, mac_address)
+        # actions only hold values, a shallow copy gives to each rule its own ones
+        flow_rule.actions = [copy.copy(action) for action in self.flow_rule.actions]
+        return flow_rule
+
+
+class DeviceFlowCompiler(object):
+    """
+    Replaces the flow rules of the end points of a graph with the rules of their devices. The rules of each
+    end point are compiled into templates the first time one of its devices is added, then the rules of
+    every device are stamped out from them. The graph is lowered again at each update, so the rules of all
+    the devices are stamped out again; their ids do not change, so only the rules of the devices added or
+    removed differ from the graph deployed.
+    """
+
+    def __init__(self, nffg, index=None):
+        """
+
+        :param nffg: the graph to which the devices are attached
+        :param index: the index of the flow rules of the graph, if already built
+        :type nffg: NF_FG
+        :type index: FlowRuleIndex
+        """
+        self.nffg = nffg
+        self.index = index if index is not None else FlowRuleIndex(nffg)
+        # end point id -> templates of its flow rules
+        self._templates = {}
+        # mac addresses of the devices whose rules are in the graph
+        self._devices = set()
+
+    def getTemplates(self, end_point_id):
+        """
+        Returns the templates of the flow rules from and to the end point, removing the rules from the graph
+
+        :rtype: list of DeviceFlowTemplate
+        """
+        templates = self._templates.get(end_point_id)
+        if templates is None:
+            from_user_flow_rules = self.index.getFlowRulesFromEndPoint(end_point_id)
+            to_user_flow_rules = self.index.getFlowRulesToEndPoint(end_point_id)
+            self.index.removeFlowRules(from_user_flow_rules + to_user_flow_rules)
+            templates = [DeviceFlowTemplate(flow_rule, 'source_mac') for flow_rule in from_user_flow_rules]
+            templates += [DeviceFlowTemplate(flow_rule, 'dest_mac') for flow_rule in to_user_flow_rules]
+            self._templates[end_point_id] = templates
+        return templates
+
+    def addDevices(self, user_devices):
+        """
+        Adds to the graph the rules of the devices not attached yet
+
+        :type user_devices: list of UserDeviceModel
+        """
+        for user_device in user_devices:
+            if user_device.mac_address in self._devices:
+                continue
+            for template in self.getTemplates(user_device.endpoint_id):
+                self.index.addFlowRule(template.stamp(user_device.mac_address))
+            self._devices.add(user_device.mac_address)
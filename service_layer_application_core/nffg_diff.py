@@ -0,0 +1,94 @@
+"""
+Created on Oct 18, 2026
+
+Structural differences between two versions of a NF-FG, used to update an instantiated graph
+sending to the orchestrator only what changed.
+"""
+# fields of the forwarding graph that can be patched element by element
+_PATCHABLE_FIELDS = ('VNFs', 'end-points', 'big-switch')
+
+
+def diff_nffg(old_nffg_dict, new_nffg_dict):
+    """
+    Computes the patch that transforms the old graph into the new one, as
+    {"forwarding-graph": {"id": ..., "end-points": {"add": [...], "remove": [ids], "update": [...]},
+                          "VNFs": {"add": [...], "remove": [ids], "update": [...],
+                                   "ports": {vnf_id: {"add": [...], "remove": [ids], "update": [...]}}},
+                          "flow-rules": {"add": [...], "remove": [ids], "update": [...]}}}
+    where only the changed sections are present. VNFs whose only change is in their ports are patched port by port.
+
+    :param old_nffg_dict: the graph currently deployed, as returned by NF_FG.getDict()
+    :param new_nffg_dict: the graph to deploy, as returned by NF_FG.getDict()
+    :type old_nffg_dict: dict
+    :type new_nffg_dict: dict
+    :return: the patch, or None if the graphs differ in something that can not be patched (e.g. their name)
+    :rtype: dict
+    """
+    old_graph = old_nffg_dict['forwarding-graph']
+    new_graph = new_nffg_dict['forwarding-graph']
+    for field in set(old_graph) | set(new_graph):
+        if field not in _PATCHABLE_FIELDS and old_graph.get(field) != new_graph.get(field):
+            return None
+    old_big_switch = old_graph.get('big-switch', {})
+    new_big_switch = new_graph.get('big-switch', {})
+    for field in set(old_big_switch) | set(new_big_switch):
+        if field != 'flow-rules' and old_big_switch.get(field) != new_big_switch.get(field):
+            return None
+
+    patch = {'id': new_graph.get('id')}
+
+    end_points = _diff_elements(old_graph.get('end-points', []), new_graph.get('end-points', []))
+    if end_points:
+        patch['end-points'] = end_points
+
+    vnfs = _diff_elements(old_graph.get('VNFs', []), new_graph.get('VNFs', []))
+    if 'update' in vnfs:
+        old_vnfs = {vnf['id']: vnf for vnf in old_graph.get('VNFs', [])}
+        updated_vnfs = []
+        ports = {}
+        for vnf in vnfs['update']:
+            old_vnf = old_vnfs[vnf['id']]
+            if _equal_except(old_vnf, vnf, 'ports'):
+                ports[vnf['id']] = _diff_elements(old_vnf.get('ports', []), vnf.get('ports', []))
+            else:
+                updated_vnfs.append(vnf)
+        if updated_vnfs:
+            vnfs['update'] = updated_vnfs
+        else:
+            del vnfs['update']
+        if ports:
+            vnfs['ports'] = ports
+    if vnfs:
+        patch['VNFs'] = vnfs
+
+    flow_rules = _diff_elements(old_big_switch.get('flow-rules', []), new_big_switch.get('flow-rules', []))
+    if flow_rules:
+        patch['flow-rules'] = flow_rules
+
+    return {'forwarding-graph': patch}
+
+
+def _diff_elements(old_elements, new_elements):
+    """
+    Compares two lists of elements identified by their id
+
+    :return: the added and updated elements and the ids of the removed ones, omitting the empty lists
+    :rtype: dict
+    """
+    old_by_id = {element['id']: element for element in old_elements}
+    new_ids = set()
+    diff = {'add': [], 'remove': [], 'update': []}
+    for element in new_elements:
+        new_ids.add(element['id'])
+        old_element = old_by_id.get(element['id'])
+        if old_element is None:
+            diff['add'].append(element)
+        elif old_element != element:
+            diff['update'].append(element)
+    diff['remove'] = [element['id'] for element in old_elements if element['id'] not in new_ids]
+    return {operation: elements for operation, elements in diff.items() if elements}
+
+
+def _equal_except(old_element, new_element, field):
+    return {key: value for key, value in old_element.items() if key != field} == \
+           {key: value for key, value in new_element.items() if key != field}
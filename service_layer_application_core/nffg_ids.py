@@ -0,0 +1,76 @@
+"""
+Created on Oct 18, 2026
+
+Allocation of the ids of the new elements (end points, flow rules, VNF ports) of a NF-FG.
+"""
+import uuid
+
+
+def derived_id(*parts):
+    """
+    Returns an id derived from its parts: the elements created while lowering a graph get the same ids at each
+    lowering, so that the graph deployed is updated only where it really changed
+
+    :param parts: the inputs identifying the element (e.g. the ids of the nodes connected by a flow rule)
+    :type parts: str
+    :rtype: str
+    """
+    return uuid.uuid5(uuid.NAMESPACE_OID, ':'.join(parts)).hex
+
+
+class GraphIdAllocator(object):
+    """
+    Allocates the ids of the elements added to a graph. Each counter is seeded from the graph the first time it is
+    used, and then advanced without scanning the graph again, so all the elements of its kind have to be added
+    through the allocator while it is in use (as for FlowRuleIndex, one allocator is built for each operation).
+    """
+
+    def __init__(self, nffg):
+        """
+
+        :param nffg: the graph to which the elements are added
+        :type nffg: NF_FG
+        """
+        self.nffg = nffg
+        self._end_point_id = None
+        self._flow_rule_id = None
+        # (vnf id, port label) -> highest relative id of the ports with that label
+        self._port_ids = {}
+
+    def nextEndPointId(self):
+        """
+        :rtype: str
+        """
+        self._end_point_id = self._next(self._end_point_id, self.nffg.getNextAvailableEndPointId)
+        return self._end_point_id
+
+    def nextFlowRuleId(self):
+        """
+        :rtype: str
+        """
+        self._flow_rule_id = self._next(self._flow_rule_id, self.nffg.getNextAvailableFlowRuleId)
+        return self._flow_rule_id
+
+    @staticmethod
+    def _next(last_id, seed):
+        if last_id is None or not last_id.isdigit():
+            # first id, or ids that can not be advanced: the graph is scanned
+            return seed()
+        # the width of the numeric ids (e.g. '00000012') is preserved
+        return str(int(last_id) + 1).zfill(len(last_id))
+
+    def nextPortId(self, vnf, port_label):
+        """
+        Returns the id of a new port of the VNF, as '<port label>:<relative id>'
+
+        :type vnf: VNF
+        :type port_label: str
+        :rtype: str
+        """
+        key = (vnf.id, port_label)
+        relative_id = self._port_ids.get(key)
+        if relative_id is None:
+            relative_id = int(vnf.getHigherReletiveIDForPortLabel(port_label))
+        relative_id += 1
+        self._port_ids[key] = relative_id
+        return port_label + ':' + str(relative_id)
@@ -0,0 +1,133 @@
+"""
+Created on Oct 18, 2026
+
+Index of the flow rules of a NF-FG by the nodes (end points and VNF ports) they connect.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def parse_node(node):
+    """
+    Parses a node of a flow rule, as 'endpoint:<end point id>' or 'vnf:<vnf id>:<port id>'
+
+    :param node: the port_in of a match or the output of an action
+    :type node: str
+    :return: the type of the node, its id and, for VNFs, the id of the port (None otherwise)
+    :rtype: tuple
+    """
+    node_type, _, node_id = node.partition(':')
+    if node_type == 'vnf':
+        vnf_id, _, port_id = node_id.partition(':')
+        return node_type, vnf_id, port_id
+    return node_type, node_id, None
+
+
+class FlowRuleIndex(object):
+    """
+    Maps each node of a NF-FG to the flow rules receiving traffic from it and sending traffic to it.
+    The index must be notified of every change to the flow rules of the graph, so transformations should
+    add, remove and rewrite the flow rules through it.
+    """
+
+    def __init__(self, nffg):
+        """
+
+        :param nffg: the graph whose flow rules are indexed
+        :type nffg: NF_FG
+        """
+        self.nffg = nffg
+        # rules are kept in dicts keyed by their python id, to preserve their order and remove them in O(1)
+        self._from_node = defaultdict(dict)
+        self._to_node = defaultdict(dict)
+        self._from_vnf = defaultdict(dict)
+        self._to_vnf = defaultdict(dict)
+        # nodes under which each rule is indexed
+        self._nodes = {}
+        for flow_rule in nffg.flow_rules:
+            self._index(flow_rule)
+
+    def _index(self, flow_rule):
+        port_in = flow_rule.match.port_in if flow_rule.match is not None else None
+        outputs = tuple(action.output for action in flow_rule.actions if action.output is not None)
+        key = id(flow_rule)
+        self._nodes[key] = (port_in, outputs)
+        if port_in is not None:
+            self._from_node[port_in][key] = flow_rule
+            node_type, node_id, _ = parse_node(port_in)
+            if node_type == 'vnf':
+                self._from_vnf[node_id][key] = flow_rule
+        for output in outputs:
+            self._to_node[output][key] = flow_rule
+            node_type, node_id, _ = parse_node(output)
+            if node_type == 'vnf':
+                self._to_vnf[node_id][key] = flow_rule
+
+    def _unindex(self, flow_rule):
+        key = id(flow_rule)
+        port_in, outputs = self._nodes.pop(key)
+        if port_in is not None:
+            self._from_node[port_in].pop(key, None)
+            node_type, node_id, _ = parse_node(port_in)
+            if node_type == 'vnf':
+                self._from_vnf[node_id].pop(key, None)
+        for output in outputs:
+            self._to_node[output].pop(key, None)
+            node_type, node_id, _ = parse_node(output)
+            if node_type == 'vnf':
+                self._to_vnf[node_id].pop(key, None)
+
+    def getFlowRulesFromNode(self, node):
+        """
+        Returns the flow rules matching the traffic coming from the node
+        """
+        return list(self._from_node.get(node, {}).values())
+
+    def getFlowRulesToNode(self, node):
+        """
+        Returns the flow rules sending traffic to the node
+        """
+        return list(self._to_node.get(node, {}).values())
+
+    def getFlowRulesFromEndPoint(self, end_point_id):
+        return self.getFlowRulesFromNode('endpoint:' + end_point_id)
+
+    def getFlowRulesToEndPoint(self, end_point_id):
+        return self.getFlowRulesToNode('endpoint:' + end_point_id)
+
+    def getFlowRulesFromVNF(self, vnf_id):
+        """
+        Returns the flow rules matching the traffic coming from any port of the VNF
+        """
+        return list(self._from_vnf.get(vnf_id, {}).values())
+
+    def getFlowRulesToVNF(self, vnf_id):
+        """
+        Returns the flow rules sending traffic to any port of the VNF
+        """
+        return list(self._to_vnf.get(vnf_id, {}).values())
+
+    def addFlowRule(self, flow_rule):
+        self.nffg.flow_rules.append(flow_rule)
+        self._index(flow_rule)
+
+    def removeFlowRules(self, flow_rules):
+        """
+        Removes the flow rules from the graph, with a single scan of its flow rules
+        """
+        removed = set()
+        for flow_rule in flow_rules:
+            if id(flow_rule) in self._nodes:
+                self._unindex(flow_rule)
+                removed.add(id(flow_rule))
+        if removed:
+            self.nffg.flow_rules[:] = [flow_rule for flow_rule in self.nffg.flow_rules
+                                       if id(flow_rule) not in removed]
+
+    def updateFlowRule(self, flow_rule):
+        """
+        Indexes again the flow rule, after its port_in or outputs have been rewritten
+        """
+        self._unindex(flow_rule)
+        self._index(flow_rule)
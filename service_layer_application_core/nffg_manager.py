@@ -3,8 +3,15 @@ Created on Oct 20, 2015
 
 @author: fabiomignini
 """
-import logging, json, uuid, os, copy, inspect
+import logging, json, os, inspect
+from collections import OrderedDict
 from service_layer_application_core.config import Configuration
+from service_layer_application_core.nffg_index import FlowRuleIndex, parse_node
+from service_layer_application_core.nffg_ids import GraphIdAllocator, derived_id
+from service_layer_application_core.nffg_device_flows import DeviceFlowCompiler, device_flow_id, DEVICE_FLOW_PRIORITY
+from service_layer_application_core.nffg_clone import clone
+from service_layer_application_core.common.graph_templates import GraphTemplateRegistry
+from service_layer_application_core import metrics
 from nffg_library.validator import ValidateNF_FG
 from nffg_library.nffg import NF_FG, VNF, Port, FlowRule, Action, Match, EndPoint
 from service_layer_application_core.sql.end_point import EndPointDB
@@ -19,11 +26,19 @@ INGRESS_GRAPH_FILE = Configuration().INGRESS_GRAPH_FILE
 SG_USER_EGRESS = Configuration().SG_USER_EGRESS
 SG_USER_INGRESS = Configuration().SG_USER_INGRESS
 
+# graphs defined in the files of the folder graphs/ of the project
+graph_templates = GraphTemplateRegistry(os.path.join(
+    os.path.realpath(os.path.abspath(os.path.split(inspect.getfile(inspect.currentframe()))[0])).rpartition('/')[0],
+    'graphs'
+))
+metrics.register('graph_templates', graph_templates.getDict)
+
 class NFFG_Manager(object):
 
     def __init__(self, nffg):
         self.nffg = nffg
         self.control_switch = None
+        self.id_allocator = GraphIdAllocator(nffg)
 
     # Graph optimization
     def mergeUselessVNFs(self):
@@ -34,29 +49,104 @@ class NFFG_Manager(object):
         self.findSwitchToMerge()
 
     def findSwitchToMerge(self):
+        """
+        Merges, in a single pass, each cluster of switches connected together into one switch.
+        Two switches are connected if a flow rule forwards the traffic from a port of one of them to a port of the
+        other: the two ports and the flow rules between them are removed, while the other ports of the switches
+        of a cluster are moved to its new switch, rewriting the flow rules through a single translation table.
+        """
         # To be merged, the two switch ports that are connected together should not filter the traffic.
-        switches = {}
-        for vnf in self.nffg.vnfs:
-            for switch_name in SWITCH_NAME:
-                if vnf.name == switch_name:
-                    switches[vnf.id] = vnf
+        switches = OrderedDict((vnf.id, vnf) for vnf in self.nffg.vnfs if vnf.name in SWITCH_NAME)
+        if len(switches) < 2:
+            return
+        parents = {switch_id: switch_id for switch_id in switches}
+
+        def find(switch_id):
+            root = switch_id
+            while parents[root] != root:
+                root = parents[root]
+            # path compression
+            while parents[switch_id] != root:
+                parents[switch_id], switch_id = root, parents[switch_id]
+            return root
+
+        # links between switches of different clusters, found in the order of the flow rules
+        removed_ports = set()
+        links = []
+        for flow_rule in self.nffg.flow_rules:
+            if flow_rule.match is None or flow_rule.match.port_in is None:
+                continue
+            node_type, switch_id, port_id = parse_node(flow_rule.match.port_in)
+            if node_type != 'vnf' or switch_id not in switches:
+                continue
+            for action in flow_rule.actions:
+                if action.output is None:
+                    continue
+                node_type, other_switch_id, other_port_id = parse_node(action.output)
+                if node_type != 'vnf' or other_switch_id not in switches:
+                    continue
+                root, other_root = find(switch_id), find(other_switch_id)
+                if root == other_root:
+                    # the ports of a link closing a loop are kept
+                    continue
+                parents[other_root] = root
+                links.append((flow_rule.match.port_in, action.output))
+                removed_ports.add((switch_id, port_id))
+                removed_ports.add((other_switch_id, other_port_id))
+                # the flow rule is removed along with the link, so its other outputs can not link other switches
+                break
+
+        if not links:
+            return
+
+        # Delete the flow-rules that connect the switches through the removed ports
+        link_nodes = set(links) | {(node2, node1) for node1, node2 in links}
+        self.nffg.flow_rules[:] = [flow_rule for flow_rule in self.nffg.flow_rules
+                                   if not self._isLinkFlowRule(flow_rule, link_nodes)]
+
+        clusters = OrderedDict()
+        for switch_id, switch in switches.items():
+            clusters.setdefault(find(switch_id), []).append(switch)
+
+        # Create a switch for each cluster, with the ports of its switches except the removed ones
+        translation = {}
+        for cluster in clusters.values():
+            if len(cluster) < 2:
+                continue
+            new_switch = self.createSwitchVNF(','.join(switch.id for switch in cluster))
+            self.nffg.addVNF(new_switch)
+            for switch in cluster:
+                for port in switch.ports:
+                    if (switch.id, port.id) in removed_ports:
+                        continue
+                    # TODO: If more switches have a control port, this will be added more times
+                    new_port = self.createSwitchPort(new_switch)
+                    new_switch.addPort(new_port)
+                    translation['vnf:'+switch.id+':'+port.id] = 'vnf:'+new_switch.id+':'+new_port.id
+                self.nffg.vnfs.remove(switch)
+
+        # Change the flow-rules of the ports of the old switches with the new port ids
         for flow_rule in self.nffg.flow_rules:
-            if flow_rule.match.port_in.split(':')[0] == 'vnf' and flow_rule.match.port_in.split(':')[1] in switches:
-                for action in flow_rule.actions:
-                    if action.output.split(':')[0] == 'vnf' and action.output.split(':')[1] in switches:
-                        self.mergeSwitches(switches[flow_rule.match.port_in.split(':')[1]],
-                                           flow_rule.match.port_in.split(':')[2]+':'+flow_rule.match.port_in.split(':')[3],
-                                           switches[action.output.split(':')[1]],
-                                           action.output.split(':')[2]+':'+action.output.split(':')[3])
-                        self.findSwitchToMerge()
-                        return
+            if flow_rule.match is not None and flow_rule.match.port_in in translation:
+                flow_rule.match.port_in = translation[flow_rule.match.port_in]
+            for action in flow_rule.actions:
+                if action.output in translation:
+                    action.output = translation[action.output]
+
+    @staticmethod
+    def _isLinkFlowRule(flow_rule, link_nodes):
+        if flow_rule.match is None:
+            return False
+        return any((flow_rule.match.port_in, action.output) in link_nodes for action in flow_rule.actions)
 
     def createEndPoint(self, name, _type="internal", switch_id=None,
                        interface=None, remote_ip=None, local_ip=None, ttl=None, status=None,
-                       db_id=None, internal_id=None, vlan_id=None, interface_internal_id=None):
-        # Create an ID
-        _id = uuid.uuid4().hex
-        # TODO: Check uniqueness of the ID
+                       db_id=None, internal_id=None, vlan_id=None, interface_internal_id=None, seed=''):
+        """
+        :param seed: distinguishes the end points with the same name created in the same graph
+        """
+        # Create an ID, the same at each lowering of the graph
+        _id = derived_id(self.nffg.id, 'endpoint', name, seed)
         end_point = EndPoint(_id=_id, name=name, _type=_type, switch_id=switch_id,
                              interface=interface, remote_ip=remote_ip, local_ip=local_ip, ttl=ttl,
                              status=status, db_id=db_id, internal_id=internal_id, vlan_id=vlan_id,
@@ -64,31 +154,30 @@ class NFFG_Manager(object):
         self.nffg.addEndPoint(end_point)
         return end_point
 
-    def createSwitchVNF(self):
-        # Create an ID
-        _id = uuid.uuid4().hex
-        # TODO: Check uniqueness of the ID
+    def createSwitchVNF(self, seed):
+        """
+        :param seed: identifies the switch in the graph, e.g. the ids of the switches it replaces
+        """
+        # Create an ID, the same at each lowering of the graph
+        _id = derived_id(self.nffg.id, 'switch', seed)
 
         return VNF(_id=_id, name=SWITCH_NAME[0], vnf_template_location=SWITCH_TEMPLATE)
 
     def createControlSwitchVNF(self, end_point_name):
-        # Create an ID
-        _id = uuid.uuid4().hex
-        # TODO: Check uniqueness of the ID
+        # Create an ID, the same at each lowering of the graph
+        _id = derived_id(self.nffg.id, 'control-switch', end_point_name)
 
         self.control_switch = VNF(_id=_id, name=CONTROL_SWITCH_NAME, vnf_template_location=SWITCH_TEMPLATE)
         endpoint_port = self.createSwitchPort(self.control_switch)
         self.control_switch.ports.append(endpoint_port)
 
         # Connect to end-point
-        end_point = self.createEndPoint(name=end_point_name)
+        end_point = self.createEndPoint(name=end_point_name, seed=self.control_switch.id)
         self.connectVNFAndEndPoint(vnf_id=self.control_switch.id, port_id=endpoint_port.id, end_point_id=end_point.id)
 
     def createSwitchPort(self, switch):
-        # Create an ID. Check the switch to obtain the maximum relative ID
-        maximum_relative_id = switch.getHigherReletiveIDForPortLabel("L2Port")
-        new_relative_id = int(maximum_relative_id) + 1
-        _id = "L2Port:"+str(new_relative_id)
+        # Create an ID, following the maximum relative ID of the switch
+        _id = self.id_allocator.nextPortId(switch, "L2Port")
 
         return Port(_id=_id, name="auto-generated-port")
 
@@ -106,53 +195,16 @@ class NFFG_Manager(object):
         to_vnf2_action = Action(output=node2)
         from_vnf1_match = Match(port_in=node1)
         from_vnf2_match = Match(port_in=node2)
-        # Create an ID
-        _id = uuid.uuid4().hex
-        # TODO: Check uniqueness of the ID
+        # the ids are derived from the connected nodes, so they are the same at each lowering of the graph
+        _id = derived_id(self.nffg.id, 'flow', node2, node1)
         self.nffg.flow_rules.append(FlowRule(_id=_id, priority=200, match=from_vnf2_match, actions=[to_vnf1_action]))
-        # Create an ID
-        _id = uuid.uuid4().hex
-        # TODO: Check uniqueness of the ID
+        _id = derived_id(self.nffg.id, 'flow', node1, node2)
         self.nffg.flow_rules.append(FlowRule(_id=_id, priority=200, match=from_vnf1_match, actions=[to_vnf2_action]))
 
-    def mergeSwitches(self, switch1, port_switch1_id, switch2, port_switch2_id):
-
-        # Create a new switch
-        new_switch = self.createSwitchVNF()
-        self.nffg.addVNF(new_switch)
-
-        # Delete ports and flow-rules that connect the two switches
-        self.nffg.deleteConnectionsBetweenVNFs(switch1.id, port_switch1_id, switch2.id, port_switch2_id)
-        for port in switch1.ports:
-            if port.id == port_switch1_id:
-                port_switch1 = port
-        switch1.ports.remove(port_switch1)
-        for port in switch2.ports:
-            if port.id == port_switch2_id:
-                port_switch2 = port
-        switch2.ports.remove(port_switch2)
-
-        # Add to the new switch the ports of the other two
-        for switch in [switch1, switch2]:
-
-            for port in switch.ports:
-                # TODO: If one of the two switches have a control port, this will be added only one time
-                new_port = self.createSwitchPort(new_switch)
-                new_switch.addPort(new_port)
-                # Change the flow-rule of the ports of the old switches with the new port id
-                for flow_rule in self.nffg.flow_rules:
-                    flow_rule.changePortOfFlowRule('vnf:'+switch.id+':'+port.id, 'vnf:'+new_switch.id+':'+new_port.id)
-
-        # Delete the previous switches and their flow-rules
-        self.nffg.vnfs.remove(switch1)
-        self.nffg.vnfs.remove(switch2)
-
     def checkIfControlNetIsNedeed(self, vnf, template):
         for port in template.ports:
             if port.label.split(":")[0] == "control":
-                higher_relative_id = vnf.getHigherReletiveIDForPortLabel(port.label)
-                new_relative_id = int(higher_relative_id) + 1
-                new_port_id = port.label+':'+str(new_relative_id)
+                new_port_id = self.id_allocator.nextPortId(vnf, port.label)
                 return True, vnf.addPort(Port(_id = new_port_id, name="Control port"))
         return False, None
 
@@ -171,23 +223,24 @@ class NFFG_Manager(object):
         """
         logging.debug("Deleting flow rule based on mac address: " + mac_address)
 
+        index = FlowRuleIndex(self.nffg)
+
         # delete flow from endpoint
-        from_user_flow_rules = self.nffg.getFlowRulesSendingTrafficFromEndPoint(device_endpoint_id)
-        for flow_rule in from_user_flow_rules[:]:
-            if flow_rule.match.source_mac == mac_address:
-                self.nffg.flow_rules.remove(flow_rule)
+        from_user_flow_rules = [flow_rule for flow_rule in index.getFlowRulesFromEndPoint(device_endpoint_id)
+                                if flow_rule.match.source_mac == mac_address]
 
         # delete flow versus endpoint
-        to_user_flow_rules = self.nffg.getFlowRulesSendingTrafficToEndPoint(device_endpoint_id)
-        for flow_rule in to_user_flow_rules[:]:
-            if flow_rule.match.dest_mac == mac_address:
-                self.nffg.flow_rules.remove(flow_rule)
+        to_user_flow_rules = [flow_rule for flow_rule in index.getFlowRulesToEndPoint(device_endpoint_id)
+                              if flow_rule.match.dest_mac == mac_address]
+
+        index.removeFlowRules(from_user_flow_rules + to_user_flow_rules)
 
     def getNumberOfFlowsForEndPoint(self, endpoint_id):
 
+        index = FlowRuleIndex(self.nffg)
         n_flows = 0
-        n_flows += len(self.nffg.getFlowRulesSendingTrafficFromEndPoint(endpoint_id))
-        n_flows += len(self.nffg.getFlowRulesSendingTrafficToEndPoint(endpoint_id))
+        n_flows += len(index.getFlowRulesFromEndPoint(endpoint_id))
+        n_flows += len(index.getFlowRulesToEndPoint(endpoint_id))
         return n_flows
 
     def deleteEndPoint(self, endpoint_id):
@@ -202,28 +255,43 @@ class NFFG_Manager(object):
         TODO: Some dirty code
         """
 
-        ingoing_flow_rules = self.nffg.getFlowRulesSendingTrafficToVNF(switch)
-        for ingoing_flow_rule in ingoing_flow_rules[:]:
-            if ingoing_flow_rule.match.port_in.split(':')[0] == 'endpoint' and ingoing_flow_rule.match.port_in.split(':')[1] != endpoint.id:
-                ingoing_flow_rule.action.output = "endpoint:"+endpoint.id
-                new_id = uuid.uuid4().hex
-                # TODO: check uniqueness of ID
-                ingoing_flow_rule.id = new_id
+        index = FlowRuleIndex(self.nffg)
+        removed_flow_rules = []
+
+        ingoing_flow_rules = index.getFlowRulesToVNF(switch.id)
+        for ingoing_flow_rule in ingoing_flow_rules:
+            node_type, node_id, _ = parse_node(ingoing_flow_rule.match.port_in)
+            if node_type == 'endpoint' and node_id != endpoint.id:
+                for action in ingoing_flow_rule.actions:
+                    if action.output is not None and parse_node(action.output)[1] == switch.id:
+                        action.output = "endpoint:"+endpoint.id
+                ingoing_flow_rule.id = self._rewrittenFlowRuleId(ingoing_flow_rule)
+                index.updateFlowRule(ingoing_flow_rule)
             else:
-                self.nffg.flow_rules.remove(ingoing_flow_rule)
+                removed_flow_rules.append(ingoing_flow_rule)
 
-        outgoing_flow_rules = self.nffg.getFlowRulesSendingTrafficFromVNF(switch)
-        for outgoing_flow_rule in outgoing_flow_rules[:]:
-            if outgoing_flow_rule.action.output.split(':')[0] == 'endpoint' and outgoing_flow_rule.action.output.split(':')[1] != endpoint.id:
+        outgoing_flow_rules = index.getFlowRulesFromVNF(switch.id)
+        for outgoing_flow_rule in outgoing_flow_rules:
+            outputs = [parse_node(action.output) for action in outgoing_flow_rule.actions if action.output is not None]
+            if any(node_type == 'endpoint' and node_id != endpoint.id for node_type, node_id, _ in outputs):
                 outgoing_flow_rule.match.port_in = "endpoint:"+endpoint.id
-                new_id = uuid.uuid4().hex
-                # TODO: check uniqueness of ID
-                outgoing_flow_rule.id = new_id
+                outgoing_flow_rule.id = self._rewrittenFlowRuleId(outgoing_flow_rule)
+                index.updateFlowRule(outgoing_flow_rule)
             else:
-                self.nffg.flow_rules.remove(outgoing_flow_rule)
+                removed_flow_rules.append(outgoing_flow_rule)
+
+        index.removeFlowRules(removed_flow_rules)
 
         self.nffg.vnfs.remove(switch)
 
+    @staticmethod
+    def _rewrittenFlowRuleId(flow_rule):
+        """
+        Returns the id of a flow rule whose nodes have been rewritten, derived from its previous id and its new nodes
+        """
+        outputs = [action.output for action in flow_rule.actions if action.output is not None]
+        return derived_id(flow_rule.id, flow_rule.match.port_in, *outputs)
+
     def connectEndpointSwitchToVNF(self, endpoint, endpoint_switch, switch_port):
         """
         UserDefnedServiceFunction function that connects the endpoint switch to the VNF
@@ -232,69 +300,42 @@ class NFFG_Manager(object):
         TODO: Some dirty code
         """
 
+        index = FlowRuleIndex(self.nffg)
+        switch_port_node = "vnf:"+endpoint_switch.id+":"+switch_port.id
+
         # Add connections from EndpointSwitch to VNFs
-        ingoing_flow_rules = self.nffg.getFlowRuleSendingTrafficFromEndPoint(endpoint.id)
+        ingoing_flow_rules = index.getFlowRulesFromEndPoint(endpoint.id)
         for ingoing_flow_rule in ingoing_flow_rules:
-            if ingoing_flow_rule.action.output.split(':')[0] == 'vnf' and ingoing_flow_rule.action.output.split(':')[1] != endpoint_switch.id:
-                ingoing_flow_rule.match.port_in = "vnf:"+endpoint_switch.id+":"+switch_port.id
-                new_id = uuid.uuid4().hex
-                # TODO: check uniqueness of ID
-                ingoing_flow_rule.id = new_id
+            outputs = [parse_node(action.output) for action in ingoing_flow_rule.actions if action.output is not None]
+            if any(node_type == 'vnf' and node_id != endpoint_switch.id for node_type, node_id, _ in outputs):
+                ingoing_flow_rule.match.port_in = switch_port_node
+                ingoing_flow_rule.id = self._rewrittenFlowRuleId(ingoing_flow_rule)
+                index.updateFlowRule(ingoing_flow_rule)
 
         # Add connections from VNFs to EndpointSwitch
-        outgoing_flow_rules = self.nffg.getFlowRulesSendingTrafficToEndPoint(endpoint.id)
+        outgoing_flow_rules = index.getFlowRulesToEndPoint(endpoint.id)
         for outgoing_flow_rule in outgoing_flow_rules:
-            if outgoing_flow_rule.match.port_in.split(':')[0] == 'vnf' and outgoing_flow_rule.match.port_in.split(':')[1] != endpoint_switch.id:
-                outgoing_flow_rule.action.output = "vnf:"+endpoint_switch.id+":"+switch_port.id
-                new_id = uuid.uuid4().hex
-                # TODO: check uniqueness of ID
-                outgoing_flow_rule.id = new_id
+            node_type, node_id, _ = parse_node(outgoing_flow_rule.match.port_in)
+            if node_type == 'vnf' and node_id != endpoint_switch.id:
+                for action in outgoing_flow_rule.actions:
+                    if action.output == "endpoint:"+endpoint.id:
+                        action.output = switch_port_node
+                outgoing_flow_rule.id = self._rewrittenFlowRuleId(outgoing_flow_rule)
+                index.updateFlowRule(outgoing_flow_rule)
 
     def addDevicesFlows(self, user_devices):
         """
         UserDefnedServiceFunction function that adds ingress flow for user new device
         :param user_devices:
         :type user_devices: list of UserDeviceModel
-        :return:
+        :return: the compiler of the device flows, to add other devices afterwards
+        :rtype: DeviceFlowCompiler
         """
         logging.debug("Adding ingress flow rule for the following devices: "+str(user_devices))
-        # ingress_endpoint = self.nffg.getEndPointsFromName("INGRESS")[0]
-
-        # create a list of unique ingress endpoints
-        ingress_endpoints_id = []
-        for user_device in user_devices:
-            if user_device.endpoint_id not in ingress_endpoints_id:
-                ingress_endpoints_id.append(user_device.endpoint_id)
-
-        # iter each endpoint
-        for ingress_endpoint_id in ingress_endpoints_id:
-            ingress_endpoint = self.nffg.getEndPoint(ingress_endpoint_id)
-            # Find flow rules from end-point
-            original_from_user_flow_rules = self.nffg.getFlowRulesSendingTrafficFromEndPoint(ingress_endpoint_id)
-            from_user_flow_rules = copy.deepcopy(original_from_user_flow_rules)
-            for original_from_user_flow_rule in original_from_user_flow_rules:
-                self.nffg.flow_rules.remove(original_from_user_flow_rule)
-            for user_device in user_devices:
-                if user_device.endpoint_id == ingress_endpoint_id:
-                    for flow_rule in from_user_flow_rules:
-                        flow_rule.priority = 1000
-                        flow_rule.match.source_mac = user_device.mac_address
-                        flow_rule.id = uuid.uuid4().hex
-                        flow_copy = copy.deepcopy(flow_rule)
-                        self.nffg.flow_rules.append(flow_copy)
-            # Find flow rules versus the end-point
-            original_to_user_flow_rules = self.nffg.getFlowRulesSendingTrafficToEndPoint(ingress_endpoint_id)
-            to_user_flow_rules = copy.deepcopy(original_to_user_flow_rules)
-            for original_to_user_flow_rule in original_to_user_flow_rules:
-                self.nffg.flow_rules.remove(original_to_user_flow_rule)
-            for user_device in user_devices:
-                if user_device.endpoint_id == ingress_endpoint_id:
-                    for flow_rule in to_user_flow_rules:
-                        flow_rule.priority = 1000
-                        flow_rule.match.dest_mac = user_device.mac_address
-                        flow_rule.id = uuid.uuid4().hex
-                        flow_copy = copy.deepcopy(flow_rule)
-                        self.nffg.flow_rules.append(flow_copy)
+        # the flow rules of each end point are compiled once, then stamped out for each of its devices
+        compiler = DeviceFlowCompiler(self.nffg)
+        compiler.addDevices(user_devices)
+        return compiler
 
     def setDeviceFlows(self, user_device):
         """
@@ -303,19 +344,21 @@ class NFFG_Manager(object):
         :type user_device: UserDeviceModel
         :return:
         """
+        index = FlowRuleIndex(self.nffg)
+
         # Find flow rules from the end-point
-        from_user_flow_rules = self.nffg.getFlowRulesSendingTrafficFromEndPoint(user_device.endpoint_id)
+        from_user_flow_rules = index.getFlowRulesFromEndPoint(user_device.endpoint_id)
         for flow_rule in from_user_flow_rules:
-            flow_rule.priority = 1000
+            flow_rule.priority = DEVICE_FLOW_PRIORITY
             flow_rule.match.source_mac = user_device.mac_address
-            flow_rule.id = uuid.uuid4().hex
+            flow_rule.id = device_flow_id(flow_rule.id, 'source_mac', user_device.mac_address)
 
         # Find flow rules versus the end-point
-        to_user_flow_rules = self.nffg.getFlowRulesSendingTrafficToEndPoint(user_device.endpoint_id)
+        to_user_flow_rules = index.getFlowRulesToEndPoint(user_device.endpoint_id)
         for flow_rule in to_user_flow_rules:
-            flow_rule.priority = 1000
+            flow_rule.priority = DEVICE_FLOW_PRIORITY
             flow_rule.match.dest_mac = user_device.mac_address
-            flow_rule.id = uuid.uuid4().hex
+            flow_rule.id = device_flow_id(flow_rule.id, 'dest_mac', user_device.mac_address)
 
     def attachIngressNF_FG(self, ingress_nffg):
         self.nffg.attachNF_FG( ingress_nffg, SG_USER_INGRESS)
@@ -337,16 +380,19 @@ class NFFG_Manager(object):
         """
         return self.getNF_FGFromFile(EGRESS_GRAPH_FILE)
 
+    @staticmethod
+    def getIngressEgressVersion():
+        """
+        Returns a version of the ingress and egress graphs, that changes whenever their files are modified
+
+        :rtype: tuple
+        """
+        return graph_templates.getVersion(INGRESS_GRAPH_FILE), graph_templates.getVersion(EGRESS_GRAPH_FILE)
+
     @staticmethod
     def getNF_FGFromFile(file_name):
         """
         Read from file a nf-fg
-        Returns a NF_FG Object
+        Returns a NF_FG Object, that is a private copy of the graph loaded by the registry
         """
-        base_folder = os.path.realpath(os.path.abspath(os.path.split(inspect.getfile( inspect.currentframe() ))[0])).rpartition('/')[0]
-        json_data=open(base_folder+"/graphs/"+file_name).read()
-        nffg_dict = json.loads(json_data)
-        ValidateNF_FG().validate(nffg_dict)
-        nffg = NF_FG()
-        nffg.parseDict(nffg_dict)
-        return nffg
+        return graph_templates.getNF_FG(file_name)
@@ -0,0 +1,54 @@
+"""
+Created on Oct 18, 2026
+
+Serialized form of a NF-FG, computed once and shared by the orchestrator requests, the database and the logs.
+"""
+import hashlib
+import json
+
+
+class GraphPayload(object):
+    """
+    The dict of a graph, taken when the payload is created, and its canonical json (sorted keys) computed at most
+    once. A graph modified afterwards needs a new payload.
+    """
+
+    def __init__(self, nffg, extended=False):
+        """
+
+        :param nffg: the graph to serialize
+        :param extended: if the extended dict of the graph is serialized, as done for the service graphs stored in db
+        :type nffg: NF_FG
+        :type extended: bool
+        """
+        self.nffg_id = nffg.id
+        self.nffg_dict = nffg.getDict(extended=extended, domain=True)
+        self._canonical = None
+        self._version = None
+
+    @property
+    def canonical(self):
+        """
+        The graph as json with sorted keys, used both as body of the requests and to compute its version
+
+        :rtype: bytes
+        """
+        if self._canonical is None:
+            self._canonical = json.dumps(self.nffg_dict, sort_keys=True).encode('utf-8')
+        return self._canonical
+
+    @property
+    def version(self):
+        """
+        The fingerprint of the content of the graph, both the version deployed and the hash of the stored graph
+
+        :rtype: str
+        """
+        if self._version is None:
+            self._version = hashlib.sha1(self.canonical).hexdigest()
+        return self._version
+
+    def __str__(self):
+        # only called when a log record is actually emitted, e.g. logging.debug("NF-FG: %s", payload)
+        return self.canonical.decode('utf-8')
+
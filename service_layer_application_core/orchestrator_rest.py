@@ -7,14 +7,181 @@ import logging
 import requests
 import json
 import ast
+import threading
+import time
+
+from http.cookiejar import DefaultCookiePolicy
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 from service_layer_application_core.config import Configuration
+from service_layer_application_core.common.cache import LRUCache, SingleFlight
+from service_layer_application_core.common.profile_cache import lowered_profiles
+from service_layer_application_core import metrics
+from service_layer_application_core.nffg_diff import diff_nffg
+from service_layer_application_core.nffg_payload import GraphPayload
 from vnf_template_library.template import Template
 from vnf_template_library.validator import ValidateTemplate
 from nffg_library.nffg import NF_FG
 from nffg_library.validator import ValidateNF_FG
 
+# templates are shared by all the users of this process, keyed by their location
+template_cache = LRUCache(Configuration().TEMPLATE_CACHE_SIZE, ttl=Configuration().TEMPLATE_CACHE_TTL)
+metrics.register('template_cache', template_cache.getDict)
+# bounds the number of templates requested in parallel by this process
+template_executor = ThreadPoolExecutor(max_workers=Configuration().TEMPLATE_FETCH_WORKERS)
+
+
+def invalidate_template(vnf_template_location=None):
+    """
+    Removes a template from the cache, or all the templates if no location is specified
+    """
+    if vnf_template_location:
+        template_cache.invalidate(vnf_template_location)
+        lowered_profiles.invalidate(('template', vnf_template_location))
+        logging.debug("Template '" + vnf_template_location + "' removed from cache")
+    else:
+        template_cache.clear()
+        lowered_profiles.clear()
+        logging.debug("Template cache cleared")
+
+
+# last graph deployed by this process for each graph key (see GlobalOrchestrator.getGraphKey), as (version, graph dict)
+deployed_graphs = LRUCache(Configuration().ORCH_DEPLOYED_GRAPH_CACHE_SIZE)
+# graphs whose patches have been answered with 404: their updates are put, until they are deleted
+unpatchable_graphs = LRUCache(Configuration().ORCH_DEPLOYED_GRAPH_CACHE_SIZE)
+# how the updates of the instantiated graphs have been sent to the orchestrator
+_update_counters = {'patch': 0, 'put': 0, 'unchanged': 0}
+_update_counters_lock = threading.Lock()
+# cleared at the first patch rejected by the orchestrator as unsupported
+_patch_supported = Configuration().ORCH_INCREMENTAL_UPDATE
+
+
+def _count_update(mode):
+    with _update_counters_lock:
+        _update_counters[mode] += 1
+
+
+def get_update_counters():
+    with _update_counters_lock:
+        counters = dict(_update_counters)
+    counters['patch_enabled'] = _patch_supported
+    counters['deployed_graphs'] = deployed_graphs.getDict()
+    counters['unpatchable_graphs'] = unpatchable_graphs.getDict()
+    return counters
+
+metrics.register('orchestrator_updates', get_update_counters)
+
+
+# status of the graphs last got from the orchestrator, as (status text, status, ttl), keyed by graph key
+# (see GlobalOrchestrator.getGraphKey)
+graph_statuses = LRUCache(Configuration().ORCH_DEPLOYED_GRAPH_CACHE_SIZE)
+# last status seen for each graph, also after it expired, to adapt the time to live of the next one
+_last_statuses = LRUCache(Configuration().ORCH_DEPLOYED_GRAPH_CACHE_SIZE)
+# concurrent status requests for the same graph are sent once
+status_requests = SingleFlight()
+# statuses that do not change until the graph is updated
+FINAL_STATUSES = ('complete', 'error', 'not_found')
+STATUS_CACHE_TTL = Configuration().ORCH_STATUS_CACHE_TTL
+STATUS_MIN_TTL = Configuration().ORCH_STATUS_MIN_TTL
+STATUS_MAX_TTL = Configuration().ORCH_STATUS_MAX_TTL
+
+
+def _cache_status(graph_key, status_text, previous):
+    """
+    Caches the status of a graph: final statuses for STATUS_CACHE_TTL, transient ones for a time to live
+    that starts from STATUS_MIN_TTL and doubles while the status does not change, up to STATUS_MAX_TTL
+    """
+    try:
+        status = json.loads(status_text).get('status')
+    except (ValueError, AttributeError):
+        return
+    if status in FINAL_STATUSES:
+        ttl = STATUS_CACHE_TTL
+    elif previous is not None and previous[1] == status:
+        ttl = min(previous[2] * 2, STATUS_MAX_TTL)
+    else:
+        ttl = STATUS_MIN_TTL
+    if ttl > 0:
+        graph_statuses.put(graph_key, (status_text, status, ttl), ttl=ttl)
+    _last_statuses.put(graph_key, (status_text, status, ttl))
+
+
+def invalidate_status(graph_key):
+    graph_statuses.invalidate(graph_key)
+    _last_statuses.invalidate(graph_key)
+
+
+def get_status_counters():
+    counters = status_requests.getDict()
+    counters['cache'] = graph_statuses.getDict()
+    return counters
+
+metrics.register('orchestrator_status', get_status_counters)
+
+
+# one pool of keep-alive connections for each orchestrator endpoint, shared by all the threads
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+# latency of the calls to the orchestrator, for each operation
+_latencies = {}
+_latencies_lock = threading.Lock()
+
+
+def _retry_policy():
+    """
+    Retries with exponential backoff the idempotent requests, on connection errors and temporary failures
+    """
+    kwargs = dict(
+        total=Configuration().ORCH_RETRIES,
+        backoff_factor=Configuration().ORCH_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False
+    )
+    try:
+        return Retry(allowed_methods=frozenset(['GET', 'HEAD']), **kwargs)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset(['GET', 'HEAD']), **kwargs)
+
+
+def get_http_session(base_url):
+    """
+    Returns the http session (i.e. the connection pool) used to contact the orchestrator at base_url
+    """
+    with _http_sessions_lock:
+        http_session = _http_sessions.get(base_url)
+        if http_session is None:
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=Configuration().ORCH_POOL_SIZE,
+                                  max_retries=_retry_policy())
+            http_session = requests.Session()
+            http_session.mount(base_url, adapter)
+            # the session is shared among users, so nothing must be retained between requests
+            http_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _http_sessions[base_url] = http_session
+        return http_session
+
+
+def _observe_latency(operation, seconds):
+    with _latencies_lock:
+        histogram = _latencies.get(operation)
+        if histogram is None:
+            histogram = _latencies[operation] = metrics.Histogram()
+    histogram.observe(seconds)
+
+
+def get_latencies():
+    with _latencies_lock:
+        latencies = dict(_latencies)
+    return {operation: histogram.getDict() for operation, histogram in latencies.items()}
+
+metrics.register('orchestrator_latency', get_latencies)
+
+
 class GlobalOrchestrator(object):
-    timeout = Configuration().ORCH_TIMEOUT
+    timeout = (Configuration().ORCH_CONNECT_TIMEOUT, int(Configuration().ORCH_TIMEOUT))
         
     def __init__(self, user_data, ip, port):
         self.ip = ip
@@ -23,6 +190,7 @@ class GlobalOrchestrator(object):
         self.base_url = "http://"+str(ip)+":"+str(port)
         self.put_url = self.base_url+"/NF-FG"
         self.delete_url = self.base_url+"/NF-FG/%s"
+        self.patch_url = self.base_url+"/NF-FG/%s"
         self.get_nffg_url = self.base_url+"/NF-FG/%s"   
         self.get_status_url = self.base_url+"/NF-FG/status/%s"  
         self.get_template = self.base_url+"/template/location/%s"
@@ -31,9 +199,54 @@ class GlobalOrchestrator(object):
                         'X-Auth-User': user_data.username,
                         'X-Auth-Pass': user_data.password,
                         'X-Auth-Tenant': user_data.tenant}
+        self.http_session = get_http_session(self.base_url)
+
+    def getGraphKey(self, nffg_id):
+        """
+        Identifies a graph in the caches of this process: graph ids come from the graphs of the users, so they
+        are unique only within the graphs of the same user of the same orchestrator
+
+        :rtype: tuple
+        """
+        return self.base_url, self.user_data.tenant, self.user_data.username, nffg_id
+
+    def _request(self, operation, method, url, **kwargs):
+        """
+        Performs a request through the connection pool of the orchestrator, tracking its latency
+        """
+        start = time.time()
+        try:
+            return self.http_session.request(method, url, headers=self.headers, timeout=self.timeout, **kwargs)
+        finally:
+            _observe_latency(operation, time.time() - start)
         
     def getTemplate(self, vnf_template_location):
-        resp = requests.get(self.get_template % (vnf_template_location), headers=self.headers, timeout=int(self.timeout))
+        """
+        Returns the template of a VNF, from cache if available.
+        The returned template is shared, so it must not be modified.
+        """
+        template = template_cache.get(vnf_template_location)
+        if template is not None:
+            logging.debug("Template '" + vnf_template_location + "' got from cache")
+            return template
+        template = self._getTemplate(vnf_template_location)
+        template_cache.put(vnf_template_location, template)
+        return template
+
+    def getTemplates(self, vnf_template_locations):
+        """
+        Returns the templates of a set of VNFs; the ones not in cache are requested in parallel.
+
+        :param vnf_template_locations: locations of the templates (duplicates are requested once)
+        :return: a dict containing for each location the corresponding template
+        :rtype: dict
+        """
+        locations = set(vnf_template_locations)
+        futures = {location: template_executor.submit(self.getTemplate, location) for location in locations}
+        return {location: future.result() for location, future in futures.items()}
+
+    def _getTemplate(self, vnf_template_location):
+        resp = self._request('get_template', 'GET', self.get_template % vnf_template_location)
         resp.raise_for_status()
         template_dict = json.loads(resp.text)
         ValidateTemplate().validate(template_dict)
@@ -43,15 +256,32 @@ class GlobalOrchestrator(object):
         return template
     
     def getNFFGStatus(self, nffg_id):
-        resp = requests.get(self.get_status_url % (nffg_id), headers=self.headers, timeout=int(self.timeout))
+        """
+        Returns the status of the graph, from cache if recently got (see _cache_status).
+        Concurrent requests for the same graph are sent once to the orchestrator.
+
+        :rtype: str
+        """
+        graph_key = self.getGraphKey(nffg_id)
+        cached = graph_statuses.get(graph_key)
+        if cached is not None:
+            logging.debug("Status of graph '" + nffg_id + "' got from cache")
+            return cached[0]
+        return status_requests.do(graph_key, lambda: self._getNFFGStatus(nffg_id))
+
+    def _getNFFGStatus(self, nffg_id):
+        graph_key = self.getGraphKey(nffg_id)
+        previous = _last_statuses.get(graph_key)
+        resp = self._request('get_status', 'GET', self.get_status_url % nffg_id)
         logging.debug("HTTP response status code: " + str(resp.status_code))
         resp.raise_for_status()
         logging.debug("Check completed")
         # dict_resp = ast.literal_eval(resp.text)
+        _cache_status(graph_key, resp.text, previous)
         return resp.text
     
     def getNFFG(self, nffg_id):
-        resp = requests.get(self.get_nffg_url % (nffg_id), headers=self.headers, timeout=int(self.timeout))
+        resp = self._request('get_nffg', 'GET', self.get_nffg_url % nffg_id)
         resp.raise_for_status()
         nffg_dict = json.loads(resp.text)
         ValidateNF_FG().validate(nffg_dict)
@@ -60,14 +290,73 @@ class GlobalOrchestrator(object):
         logging.debug("Get NFFG completed")
         return nffg
         
-    def put(self, nffg):
-        resp = requests.put(self.put_url, data=nffg.getJSON(domain=True), headers=self.headers, timeout=int(self.timeout))
+    def update(self, nffg, deployed_version=None, payload=None):
+        """
+        Deploys the graph. If the graph currently deployed is the last one deployed by this process,
+        only the differences from it are sent to the orchestrator as a patch; otherwise, or if the orchestrator
+        does not support patches, the whole graph is put.
+
+        :param nffg: the graph to deploy
+        :param deployed_version: the version of the graph currently deployed, as stored in db (None if unknown)
+        :param payload: the payload of the graph, if already serialized
+        :type nffg: NF_FG
+        :type deployed_version: str
+        :type payload: GraphPayload
+        :return: the version of the deployed graph
+        :rtype: str
+        """
+        if payload is None:
+            payload = GraphPayload(nffg)
+        try:
+            mode = self._update(nffg.id, payload, deployed_version)
+        except Exception:
+            # the graph in the orchestrator is unknown after a failure
+            deployed_graphs.invalidate(self.getGraphKey(nffg.id))
+            invalidate_status(self.getGraphKey(nffg.id))
+            raise
+        if mode != 'unchanged':
+            invalidate_status(self.getGraphKey(nffg.id))
+            deployed_graphs.put(self.getGraphKey(nffg.id), (payload.version, payload.nffg_dict))
+        _count_update(mode)
+        return payload.version
+
+    def _update(self, nffg_id, payload, deployed_version):
+        global _patch_supported
+        version = payload.version
+        graph_key = self.getGraphKey(nffg_id)
+        deployed = deployed_graphs.get(graph_key)
+        if _patch_supported and deployed is not None and deployed_version is not None \
+                and deployed[0] == deployed_version and graph_key not in unpatchable_graphs:
+            if version == deployed_version:
+                logging.debug("Graph '" + nffg_id + "' not changed, nothing to send to the orchestrator")
+                return 'unchanged'
+            patch = diff_nffg(deployed[1], payload.nffg_dict)
+            if patch is not None:
+                patch_body = json.dumps(patch)
+                logging.debug("Patching graph '%s': %s", nffg_id, patch_body)
+                resp = self._request('patch', 'PATCH', self.patch_url % nffg_id, data=patch_body)
+                if resp.status_code in (405, 501):
+                    logging.warning("The orchestrator does not support graph patches, whole graphs will be put")
+                    _patch_supported = False
+                elif resp.status_code == 404:
+                    logging.debug("Graph '" + nffg_id + "' can not be patched, its updates will be put")
+                    unpatchable_graphs.put(graph_key, True)
+                else:
+                    resp.raise_for_status()
+                    logging.debug("Patch completed")
+                    return 'patch'
+        # the canonical json of the graph is both its version and the body of the request
+        resp = self._request('put', 'PUT', self.put_url, data=payload.canonical)
         resp.raise_for_status()
         logging.debug("Put completed")
-        return resp.text
+        return 'put'
     
     def delete(self, nffg_id):
-        resp = requests.delete(self.delete_url % (nffg_id), headers=self.headers, timeout=int(self.timeout))
+        graph_key = self.getGraphKey(nffg_id)
+        deployed_graphs.invalidate(graph_key)
+        unpatchable_graphs.invalidate(graph_key)
+        invalidate_status(graph_key)
+        resp = self._request('delete', 'DELETE', self.delete_url % nffg_id)
         resp.raise_for_status()
         logging.debug("Delete completed")
         return resp.text        
\ No newline at end of file
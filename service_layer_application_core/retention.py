@@ -0,0 +1,143 @@
+"""
+Created on Oct 18, 2026
+
+Retention of the database: a background job periodically moves the ended sessions to the history
+tables and deletes the end points no longer used by any graph or device.
+All the work is done in small transactions, so that the tables are never locked for long.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from service_layer_application_core.config import Configuration
+from service_layer_application_core.sql.end_point import EndPointDB
+from service_layer_application_core.sql.graph import Graph
+from service_layer_application_core.sql.session_history import SessionHistory
+from service_layer_application_core.sql.sql_server import get_engine, remove_session
+from service_layer_application_core import metrics
+
+ARCHIVE_AFTER = Configuration().DB_ARCHIVE_AFTER
+RETENTION_INTERVAL = Configuration().DB_RETENTION_INTERVAL
+RETENTION_BATCH_SIZE = Configuration().DB_RETENTION_BATCH_SIZE
+# name of the mysql lock that lets a single process at a time run the job
+RETENTION_LOCK = 'service_layer_retention'
+
+
+class RetentionJob(object):
+
+    def __init__(self, archive_after=ARCHIVE_AFTER, interval=RETENTION_INTERVAL, batch_size=RETENTION_BATCH_SIZE):
+        """
+
+        :param archive_after: seconds after which an ended session is archived
+        :param interval: seconds between two runs
+        :param batch_size: rows moved or deleted by each transaction
+        :type archive_after: int
+        :type interval: int
+        :type batch_size: int
+        """
+        self.archive_after = archive_after
+        self.interval = interval
+        self.batch_size = batch_size
+        # end points created after the previous run may belong to a graph not yet stored, so only the ones
+        # not greater than the last id seen by the previous run can be deleted
+        self._end_points_high_water = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.archived_sessions = 0
+        self.deleted_end_points = 0
+        self.last_run = None
+
+    def start(self):
+        """
+        Starts the job in a daemon thread of this process
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run()
+            except Exception as ex:
+                logging.exception(ex)
+            finally:
+                remove_session()
+
+    def run(self):
+        """
+        Runs the job once, unless another process is already running it
+        """
+        connection = get_engine().connect()
+        try:
+            if not self._acquire_lock(connection):
+                logging.debug("Retention job already running in another process")
+                return
+            try:
+                archived_sessions = self._archive_sessions()
+                deleted_end_points = self._delete_unused_end_points()
+            finally:
+                self._release_lock(connection)
+        finally:
+            connection.close()
+        with self._lock:
+            self.runs += 1
+            self.archived_sessions += archived_sessions
+            self.deleted_end_points += deleted_end_points
+            self.last_run = datetime.datetime.now().isoformat()
+        if archived_sessions or deleted_end_points:
+            logging.info("Retention: archived " + str(archived_sessions) + " sessions, deleted " +
+                         str(deleted_end_points) + " end points")
+
+    def _archive_sessions(self):
+        ended_before = datetime.datetime.now() - datetime.timedelta(seconds=self.archive_after)
+        archived = 0
+        while True:
+            batch = SessionHistory.archive_ended_sessions(ended_before, self.batch_size)
+            archived += batch
+            if batch < self.batch_size:
+                return archived
+
+    def _delete_unused_end_points(self):
+        high_water = self._end_points_high_water
+        self._end_points_high_water = EndPointDB.get_last_end_point_id()
+        if high_water is None:
+            return 0
+        # the end points of the graphs stored by previous versions are recorded before any of them is deleted
+        while Graph.record_end_points(self.batch_size) == self.batch_size:
+            pass
+        deleted = 0
+        while True:
+            batch = EndPointDB.delete_unused_end_points(high_water, self.batch_size)
+            deleted += batch
+            if batch < self.batch_size:
+                return deleted
+
+    @staticmethod
+    def _acquire_lock(connection):
+        if connection.dialect.name != 'mysql':
+            return True
+        return connection.execute(text("SELECT GET_LOCK(:name, 0)"), name=RETENTION_LOCK).scalar() == 1
+
+    @staticmethod
+    def _release_lock(connection):
+        if connection.dialect.name == 'mysql':
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), name=RETENTION_LOCK)
+
+    def getDict(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'archived_sessions': self.archived_sessions,
+                'deleted_end_points': self.deleted_end_points,
+                'last_run': self.last_run
+            }
+
+retention_job = RetentionJob()
+metrics.register('retention', retention_job.getDict)
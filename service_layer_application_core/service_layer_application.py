@@ -16,14 +16,123 @@ from service_layer_application_core.authentication_graph_manager import AuthGrap
 from service_layer_application_core.client_graph_manager import ClientGraphManager
 from service_layer_application_core.nffg_manager import NFFG_Manager
 from service_layer_application_core.sql.user import User
+from service_layer_application_core.sql.sql_server import remove_session
+from service_layer_application_core import metrics
 from service_layer_application_core.user_authentication import UserAuthentication
 from service_layer_application_core.exception import SessionNotFound, UnauthorizedRequest, RequestValidationError, \
-    GraphNotFound
+    GraphNotFound, DeploymentQueueFull
 from service_layer_application_core.controller import ServiceLayerController
 from service_layer_application_core.validate_request import RequestValidator
+from service_layer_application_core.deployment import deploy_user_graph, undeploy_user_device, deployment_queue
+from service_layer_application_core.config import Configuration
 
 from json.decoder import JSONDecodeError
 
+ASYNC_DEPLOYMENT = Configuration().ASYNC_DEPLOYMENT
+ADMIN_NAME = Configuration().ADMIN_NAME
+
+
+class DBSessionMiddleware(object):
+    """
+    Releases the database session bound to a request once it has been served,
+    so that its connection returns to the pool and no state leaks into the next request.
+    """
+
+    def process_response(self, request, response, resource):
+        remove_session()
+
+
+class ServiceLayerMetrics(object):
+    """
+    Exports the runtime metrics of this service layer process (e.g. db connection pool usage)
+    """
+
+    def on_get(self, request, response):
+        """
+        Get the metrics of all the components of this process
+
+        :param request: HTTP GET request containing the credential of the admin as headers (X-Auth-User, X-Auth-Pass,
+                        X-Auth-Tenant)
+        :param response: the metrics, as {"db_pool": {...}, "deployment_queue": {...}, ...}
+        """
+        try:
+            user_data = UserAuthentication().authenticateUserFromRESTRequest(request)
+            # the metrics are about the whole process, not only the graphs of the user
+            if user_data.username != ADMIN_NAME:
+                raise falcon.HTTPForbidden("Forbidden. ", "Only the admin can read the metrics")
+            response.body = json.dumps(metrics.collect())
+            response.status = falcon.HTTP_200
+        except falcon.HTTPError as err:
+            logging.exception("Falcon " + err.title)
+            raise
+        except UnauthorizedRequest as err:
+            raise falcon.HTTPUnauthorized("Authentication error. ", err.message)
+        except Exception as err:
+            logging.exception(err)
+            raise falcon.HTTPInternalServerError('Contact the admin. ', str(err))
+
+
+class ServiceLayerJob(object):
+    """
+    Tracks the deployments requested to the service layer when it runs in asynchronous mode
+    """
+
+    def on_get(self, request, response, job_id):
+        """
+        Get the status of a deployment job (queued, in_progress, complete or error)
+
+        :param request: HTTP GET request containing user credential as headers (X-Auth-User, X-Auth-Pass, X-Auth-Tenant)
+        :param response: the job, as {"job": {"id": "...", "status": "in_progress", ...}}
+        :param job_id: the id of the job returned by the PUT
+        """
+        try:
+            user_data = UserAuthentication().authenticateUserFromRESTRequest(request)
+            job = deployment_queue.get_job(job_id)
+            # users can see only their own jobs
+            if job is None or job.user_data.username != user_data.username:
+                raise falcon.HTTPNotFound()
+            response.body = json.dumps({'job': job.getDict()})
+            response.status = falcon.HTTP_200
+        except falcon.HTTPError as err:
+            logging.exception("Falcon " + err.title)
+            raise
+        except UnauthorizedRequest as err:
+            raise falcon.HTTPUnauthorized("Authentication error. ", err.message)
+        except Exception as err:
+            logging.exception(err)
+            raise falcon.HTTPInternalServerError('Contact the admin. ', str(err))
+
+
+class ServiceLayerStatus(object):
+    """
+    Notifies the clients of the changes of the session of the user (long polling)
+    """
+
+    def on_get(self, request, response):
+        """
+        Get the status of the user session (e.g. inizialization, updating, complete, error) as soon as it changes
+
+        :param request: HTTP GET request containing user credential as headers (X-Auth-User, X-Auth-Pass, X-Auth-Tenant)
+                        and optionally the parameters 'since', the version of the status already known by the client,
+                        and 'timeout', the maximum seconds to wait for a change of it
+        :param response: the status, as {"session": {"id": "...", "graph_id": "...", "status": "complete"},
+                         "version": "...", "changed": true}
+        """
+        try:
+            user_data = UserAuthentication().authenticateUserFromRESTRequest(request)
+            controller = ServiceLayerController(user_data)
+            status = controller.wait_status(request.get_param('since'), request.get_param_as_int('timeout', min=0))
+            response.body = json.dumps(status)
+            response.status = falcon.HTTP_200
+        except falcon.HTTPError as err:
+            logging.exception("Falcon " + err.title)
+            raise
+        except UnauthorizedRequest as err:
+            raise falcon.HTTPUnauthorized("Authentication error. ", err.message)
+        except Exception as err:
+            logging.exception(err)
+            raise falcon.HTTPInternalServerError('Contact the admin. ', str(err))
+
 
 class ServiceLayer(object):
     """
@@ -41,11 +150,15 @@ class ServiceLayer(object):
         """
         try:
             user_data = UserAuthentication().authenticateUserFromRESTRequest(request)
-            graph_manager = ClientGraphManager(user_data)
-            graph_manager.delete_endpoint_from_user_device_if_last(mac_address)
-            # Now, it initialize a new controller instance to handle the request
-            controller = ServiceLayerController(user_data)
-            controller.delete(mac_address=mac_address, nffg=graph_manager.nffg)
+            if mac_address is not None:
+                # the device is detached along with the other logins and logouts of the user
+                undeploy_user_device(user_data, mac_address)
+            else:
+                graph_manager = ClientGraphManager(user_data)
+                graph_manager.delete_endpoint_from_user_device_if_last(mac_address)
+                # Now, it initialize a new controller instance to handle the request
+                controller = ServiceLayerController(user_data)
+                controller.delete(mac_address=mac_address, nffg=graph_manager.nffg)
         except NoResultFound:
             print("EXCEPTION - NoResultFound")
             raise falcon.HTTPNotFound()
@@ -97,25 +210,16 @@ class ServiceLayer(object):
         try:
             user_data = UserAuthentication().authenticateUserFromRESTRequest(request)
             logging.debug("Authenticated user: " + user_data.username)
-            # Now, it initialize a new controller instance to handle the request
-            controller = ServiceLayerController(user_data)
             request_dict = json.loads(request.stream.read().decode())
             RequestValidator.validate(request_dict)
-            if 'device' in request_dict['session']:
-                # add a new endpoint to the graph for this device if it came from a new port
-                graph_manager = ClientGraphManager(user_data)
-                graph_manager.prepare_egress_end_point()
-                device_endpoint_id = graph_manager.add_endpoint_from_auth_switch_interface(
-                    request_dict['session']['device']['port']
-                )
-                # send request to controller
-                controller.put(
-                    mac_address=request_dict['session']['device']['mac'],
-                    nffg=graph_manager.nffg,
-                    device_endpoint_id=device_endpoint_id
-                )
+            device = request_dict['session'].get('device')
+            if ASYNC_DEPLOYMENT:
+                # the deployment is performed in background, the client can follow it through the job
+                job = deployment_queue.submit(user_data, device)
+                response.body = json.dumps({'job': job.getDict()})
+                response.location = '/service-layer/jobs/' + job.id
             else:
-                controller.put()
+                deploy_user_graph(user_data, device)
             response.status = falcon.HTTP_202
         except requests.HTTPError as err:
             logging.exception(err.response.text)
@@ -149,6 +253,8 @@ class ServiceLayer(object):
             raise falcon.HTTPUnauthorized("Authentication error. ", err.message)
         except GraphNotFound as err:
             raise falcon.HTTPForbidden("Graph not found. ", err.message)
+        except DeploymentQueueFull as err:
+            raise falcon.HTTPServiceUnavailable("Service Unavailable", err.message, 30)
         except Exception as err:
             logging.exception(err)
             raise falcon.HTTPInternalServerError('Contact the admin. ', str(err))
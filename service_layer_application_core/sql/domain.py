@@ -19,7 +19,7 @@ class DomainModel(Base):
     """
     __tablename__ = 'domain'
     attributes = ['id', 'name', 'type']
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(VARCHAR(64))
     type = Column(VARCHAR(64))
 
@@ -61,14 +61,12 @@ class Domain(object):
     @staticmethod
     def add_domain(domain_name, domain_type):
         session = get_session()
-        with session.begin():
-            max_id = -1
-            domain_refs = session.query(DomainModel).all()
-            for domain_ref in domain_refs:
-                if domain_ref.id > max_id:
-                    max_id = domain_ref.id
-                if domain_ref.name == domain_name and domain_ref.type == domain_type:
-                    return domain_ref.id
-            domain = DomainModel(id=max_id + 1, name=domain_name, type=domain_type)
+        with session.begin(subtransactions=True):
+            domain_ref = session.query(DomainModel).filter_by(name=domain_name, type=domain_type).first()
+            if domain_ref is not None:
+                return domain_ref.id
+            domain = DomainModel(name=domain_name, type=domain_type)
             session.add(domain)
+            # the id is assigned by the db
+            session.flush()
             return domain.id
@@ -10,7 +10,6 @@ from sqlalchemy.ext.declarative import declarative_base
 from service_layer_application_core.sql.sql_server import get_session
 from service_layer_application_core.config import Configuration
 from service_layer_application_core.domain_info import DomainInfo, GreTunnel, Interface, Neighbor
-from sqlalchemy.sql import func
 from sqlalchemy.orm.exc import NoResultFound
 
 from service_layer_application_core.sql.domain import DomainModel
@@ -22,7 +21,7 @@ sql_server = Configuration().DB_CONNECTION
 class DomainsInformationModel(Base):
     __tablename__ = 'domain_information'
     attributes = ['id', 'domain_id', 'node', 'interface', 'interface_type', 'gre', 'vlan']
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     domain_id = Column(Integer)
     node = Column(Integer)
     interface = Column(VARCHAR(64))
@@ -34,7 +33,7 @@ class DomainsInformationModel(Base):
 class DomainsGreModel(Base):
     __tablename__ = 'domain_gre'
     attributes = ['id', 'name', 'domain_info_id', 'local_ip', 'remote_ip', 'gre_key']
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(VARCHAR(64))
     domain_info_id = Column(Integer)
     local_ip = Column(VARCHAR(64))
@@ -46,7 +45,7 @@ class DomainsNeighborModel(Base):
     __tablename__ = 'domain_neighbor'
     attributes = ['id', 'domain_info_id', 'neighbor_domain_name', 'neighbor_node', 'neighbor_interface',
                   'neighbor_domain_type']
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     domain_info_id = Column(Integer)
     neighbor_domain_name = Column(VARCHAR(64))
     neighbor_node = Column(VARCHAR(64))
@@ -110,7 +109,7 @@ class DomainInformation(object):
     @staticmethod
     def get_domain_id_from_node(node):
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             domain = session.query(DomainsInformationModel).filter_by(node=node).first()
             if domain is None:
                 return None
@@ -126,7 +125,7 @@ class DomainInformation(object):
         :rtype: str
         """
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             domain = session.query(DomainsInformationModel)\
                 .filter_by(domain_id=domain_id)\
                 .filter_by(interface=interface)\
@@ -142,7 +141,7 @@ class DomainInformation(object):
         :param domain_info: the structure containing domain information
         """
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             if update is False:
                 try:
                     domain_refs = session.query(DomainsInformationModel).filter_by(
@@ -153,61 +152,26 @@ class DomainInformation(object):
                         session.query(DomainsNeighborModel).filter_by(domain_info_id=domain_ref.id).delete()
                 except NoResultFound:
                     pass
-            self.id_generator(domain_info)
             for interface in domain_info.interfaces:
-                info_ref = DomainsInformationModel(id=self.info_id, domain_id=domain_info.domain_id,
+                info_ref = DomainsInformationModel(domain_id=domain_info.domain_id,
                                                    node=interface.node, interface=interface.name,
                                                    interface_type=interface.type, gre=interface.gre,
                                                    vlan=interface.vlan)
                 session.add(info_ref)
+                # the id is assigned by the db, neighbors and tunnels need it
+                session.flush()
                 for neighbor in interface.neighbors:
-                    neighbor_ref = DomainsNeighborModel(id=self.neighbor_id, domain_info_id=self.info_id,
+                    neighbor_ref = DomainsNeighborModel(domain_info_id=info_ref.id,
                                                         neighbor_domain_name=neighbor.domain_name,
                                                         neighbor_node=neighbor.node,
                                                         neighbor_interface=neighbor.interface,
                                                         neighbor_domain_type=neighbor.domain_type)
                     session.add(neighbor_ref)
-                    self.neighbor_id += 1
                 for gre_tunnel in interface.gre_tunnels:
-                    gre_ref = DomainsGreModel(id=self.gre_id, name=gre_tunnel.name, domain_info_id=self.info_id,
+                    gre_ref = DomainsGreModel(name=gre_tunnel.name, domain_info_id=info_ref.id,
                                               local_ip=gre_tunnel.local_ip, remote_ip=gre_tunnel.remote_ip,
                                               gre_key=gre_tunnel.gre_key)
                     session.add(gre_ref)
-                    self.gre_id += 1
-
-                self.info_id += 1
-
-    def id_generator(self, domain_info):
-        info_base_id = self._get_higher_info_id()
-        gre_base_id = self._get_higher_gre_id()
-        neighbor_base_id = self._get_higher_neighbor_id()
-        if info_base_id is not None:
-            self.info_id = int(info_base_id) + 1
-        else:
-            self.info_id = 0
-        if gre_base_id is not None:
-            self.gre_id = int(gre_base_id) + 1
-        else:
-            self.gre_id = 0
-        if neighbor_base_id is not None:
-            self.neighbor_id = int(neighbor_base_id) + 1
-        else:
-            self.neighbor_id = 0
-
-    @staticmethod
-    def _get_higher_info_id():
-        session = get_session()
-        return session.query(func.max(DomainsInformationModel.id).label("max_id")).one().max_id
-
-    @staticmethod
-    def _get_higher_gre_id():
-        session = get_session()
-        return session.query(func.max(DomainsGreModel.id).label("max_id")).one().max_id
-
-    @staticmethod
-    def _get_higher_neighbor_id():
-        session = get_session()
-        return session.query(func.max(DomainsNeighborModel.id).label("max_id")).one().max_id
 
     @staticmethod
     def get_domain_gre(domain_gre_id):
@@ -224,25 +188,18 @@ class DomainInformation(object):
     def add_domain_gre(domain_name, domain_info_id, local_ip, remote_ip, gre_key, domain_gre_id=None):
         session = get_session()
 
-        with session.begin():
+        with session.begin(subtransactions=True):
             if domain_gre_id is not None:
-                _id = domain_gre_id
-                domain_gre_refs = session.query(DomainsGreModel).all()
-                for domain_gre_ref in domain_gre_refs:
-                    if domain_gre_ref.id == domain_gre_id:
-                        # TODO create an exception
-                        raise Exception
+                if session.query(DomainsGreModel.id).filter_by(id=domain_gre_id).first() is not None:
+                    # TODO create an exception
+                    raise Exception
             else:
-                max_id = -1
-                domain_gre_refs = session.query(DomainsGreModel).all()
-                for domain_gre_ref in domain_gre_refs:
-                    if domain_gre_ref.id > max_id:
-                        max_id = domain_gre_ref.id
-                    if domain_gre_ref.domain_info_id == domain_info_id:
-                        return domain_gre_ref.id
-                _id = max_id+1
+                domain_gre_ref = session.query(DomainsGreModel).filter_by(domain_info_id=domain_info_id).first()
+                if domain_gre_ref is not None:
+                    return domain_gre_ref.id
+            # if no id is specified, it is assigned by the db
             domain_gre = DomainsGreModel(
-                id=_id,
+                id=domain_gre_id,
                 name=domain_name,
                 domain_info_id=domain_info_id,
                 local_ip=local_ip,
@@ -250,4 +207,5 @@ class DomainInformation(object):
                 gre_key=gre_key
             )
             session.add(domain_gre)
+            session.flush()
             return domain_gre.id
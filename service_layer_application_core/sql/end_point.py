@@ -4,12 +4,15 @@ Created on 19 Apr 2016
 @author: gabrielecastellano
 """
 
-from sqlalchemy import Column, VARCHAR, Integer
+from sqlalchemy import Column, VARCHAR, Integer, String, func, exists, cast
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm.exc import NoResultFound
 
 from service_layer_application_core.sql.sql_server import get_session
 from service_layer_application_core.config import Configuration
+from service_layer_application_core.common.profile_cache import lowered_profiles
+from service_layer_application_core.sql.graph import GraphEndPointModel
+from service_layer_application_core.sql.session import UserDeviceModel
 
 Base = declarative_base()
 sql_server = Configuration().DB_CONNECTION
@@ -18,7 +21,7 @@ sql_server = Configuration().DB_CONNECTION
 class EndPointModel(Base):
     __tablename__ = 'end_point'
     attributes = ['id', 'name', 'node', 'type', 'domain_name', 'interface']
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(VARCHAR(64))
     type = Column(VARCHAR(64))
     domain_name = Column(VARCHAR(64))
@@ -33,20 +36,16 @@ class EndPointDB(object):
     def add_end_point(name, _type, domain, interface):
 
         session = get_session()
-        with session.begin():
-            max_id = -1
-            end_points_refs = session.query(EndPointModel).all()
-            for end_point_ref in end_points_refs:
-                if end_point_ref.id > max_id:
-                    max_id = end_point_ref.id
+        with session.begin(subtransactions=True):
             end_point = EndPointModel(
-                id=max_id + 1,
                 name=name,
                 type=_type,
                 domain_name=domain,
                 interface=interface
             )
             session.add(end_point)
+            # the id is assigned by the db
+            session.flush()
             return end_point.id
 
     @staticmethod
@@ -81,8 +80,47 @@ class EndPointDB(object):
             .filter_by(interface=interface)\
             .one()
 
+    @staticmethod
+    def get_last_end_point_id():
+        """
+        :return: the highest id assigned to an end point, or None if there are no end points
+        :rtype: int
+        """
+        session = get_session()
+        return session.query(func.max(EndPointModel.id)).scalar()
+
+    @staticmethod
+    def delete_unused_end_points(max_id, batch_size):
+        """
+        Deletes, in a single transaction, a batch of the end points not referenced by any graph or device
+
+        :param max_id: only end points with an id not greater than this are deleted
+        :param batch_size: maximum number of end points deleted
+        :type max_id: int
+        :type batch_size: int
+        :return: the number of end points deleted
+        :rtype: int
+        """
+        session = get_session()
+        with session.begin(subtransactions=True):
+            unused_ids = [end_point_ref.id for end_point_ref in session.query(EndPointModel.id)
+                          .filter(EndPointModel.id <= max_id)
+                          .filter(~exists().where(GraphEndPointModel.end_point_id == EndPointModel.id))
+                          # the devices store the ids as strings
+                          .filter(~exists().where(UserDeviceModel.endpoint_db_id == cast(EndPointModel.id, String)))
+                          .order_by(EndPointModel.id)
+                          .limit(batch_size)]
+            if unused_ids:
+                session.query(EndPointModel)\
+                    .filter(EndPointModel.id.in_(unused_ids))\
+                    .delete(synchronize_session=False)
+        for end_point_id in unused_ids:
+            lowered_profiles.invalidate(('end_point', str(end_point_id)))
+        return len(unused_ids)
+
     @staticmethod
     def delete_end_point(db_id):
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(EndPointModel).filter_by(id=db_id).delete()
+        lowered_profiles.invalidate(('end_point', str(db_id)))
@@ -8,43 +8,79 @@ Created on Jun 20, 2015
 import logging
 import json
 
-from sqlalchemy import Column, VARCHAR, Boolean, Integer, Text
+from sqlalchemy import Column, VARCHAR, Boolean, Integer, Text, func
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from service_layer_application_core.sql.sql_server import get_session
-from sqlalchemy.sql import func
 
+from nffg_library.nffg import NF_FG
 from service_layer_application_core.config import Configuration
-from service_layer_application_core.sql.session import Session
+from service_layer_application_core.common import graph_codec
+from service_layer_application_core.common.cache import LRUCache
+from service_layer_application_core.nffg_clone import clone
+from service_layer_application_core.nffg_payload import GraphPayload
+from service_layer_application_core.sql.session import Session, SessionModel
+from service_layer_application_core.exception import SessionNotFound
+from service_layer_application_core import metrics
 
 Base = declarative_base()
 sql_server = Configuration().DB_CONNECTION
 
+GRAPH_CODEC = Configuration().DB_GRAPH_CODEC
+if GRAPH_CODEC not in graph_codec.get_codecs():
+    logging.warning("Graph codec '" + GRAPH_CODEC + "' not available, service graphs will be stored with 'zlib'")
+    GRAPH_CODEC = 'zlib'
+# service graphs already decoded and parsed, keyed by the hash of their content
+decoded_graphs = LRUCache(Configuration().DB_GRAPH_CACHE_SIZE)
+metrics.register('service_graph_cache', decoded_graphs.getDict)
+
 
 class GraphModel(Base):
     """
     Maps the database table graph
     """
     __tablename__ = 'graph'
-    attributes = ['id', 'session_id', 'domain_id', 'partial', 'service_graph']
-    id = Column(Integer, primary_key=True)
+    attributes = ['id', 'session_id', 'domain_id', 'partial', 'service_graph', 'deployed_version']
+    id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(VARCHAR(64))
     domain_id = Column(Integer)
     partial = Column(Boolean())
-    service_graph = Column(Text)
+    # loaded only when accessed, since readers often need just the hash in its header
+    service_graph = deferred(Column(Text))
+    # version of the graph deployed in the orchestrator from this service graph
+    deployed_version = Column(VARCHAR(64))
+    # if its end points are in graph_end_point (graphs stored by previous versions are recorded by the retention job)
+    end_points_recorded = Column(Boolean())
+
+
+class GraphEndPointModel(Base):
+    """
+    Maps the database table graph_end_point: the end points of the database referenced by each graph
+    """
+    __tablename__ = 'graph_end_point'
+    graph_id = Column(Integer, primary_key=True, autoincrement=False)
+    end_point_id = Column(Integer, primary_key=True, autoincrement=False)
 
 
 class Graph(object):
     def __init__(self):
         self.user_session = Session()
 
-    def add_graph(self, nffg, session_id, partial=False):
+    def add_graph(self, nffg, session_id, partial=False, deployed_version=None, payload=None):
+        """
+        :param payload: the extended payload of the graph, if already serialized
+        :type payload: GraphPayload
+        """
         session = get_session()  
-        with session.begin():
-            _id = self.id_generator(session_id)
-            service_graph = json.dumps(nffg.getDict(extended=True, domain=True))
-            graph_ref = GraphModel(id=_id, session_id=session_id, partial=partial, service_graph=service_graph)
+        with session.begin(subtransactions=True):
+            service_graph, _ = Graph._encode(nffg, payload)
+            graph_ref = GraphModel(session_id=session_id, partial=partial, service_graph=service_graph,
+                                   deployed_version=deployed_version, end_points_recorded=True)
             session.add(graph_ref)
-        return _id
+            # the id is assigned by the db
+            session.flush()
+            Graph._set_end_points(graph_ref.id, nffg)
+            return graph_ref.id
 
     def delete_session(self, session_id):
         session = get_session()
@@ -55,26 +91,137 @@ class Graph(object):
     @staticmethod
     def set_graph_partial(graph_id, partial=True):
         session = get_session()  
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(GraphModel).filter_by(id=graph_id).update({"partial": partial})
 
     @staticmethod
-    def set_service_graph(graph_id, nffg):
+    def set_service_graph(graph_id, nffg, deployed_version=None, payload=None):
+        """
+        :param payload: the extended payload of the graph, if already serialized
+        :type payload: GraphPayload
+        """
+        session = get_session()
+        with session.begin(subtransactions=True):
+            service_graph, graph_hash = Graph._encode(nffg, payload)
+            values = {"deployed_version": deployed_version}
+            # the graph is rewritten only if changed
+            if graph_hash != Graph.get_service_graph_hash(graph_id):
+                values["service_graph"] = service_graph
+                values["end_points_recorded"] = True
+                Graph._set_end_points(graph_id, nffg)
+            session.query(GraphModel).filter_by(id=graph_id).update(values)
+
+    @staticmethod
+    def _set_end_points(graph_id, nffg):
+        """
+        Records the end points of the database referenced by the graph, replacing the ones previously recorded
+        """
+        session = get_session()
+        end_point_ids = {int(end_point.db_id) for end_point in nffg.end_points
+                         if end_point.db_id is not None and str(end_point.db_id).isdigit()}
+        session.query(GraphEndPointModel).filter_by(graph_id=graph_id).delete(synchronize_session=False)
+        session.add_all([GraphEndPointModel(graph_id=graph_id, end_point_id=end_point_id)
+                         for end_point_id in sorted(end_point_ids)])
+
+    @staticmethod
+    def record_end_points(batch_size):
+        """
+        Records the end points referenced by a batch of the graphs stored without them by previous versions
+
+        :param batch_size: maximum number of graphs recorded
+        :type batch_size: int
+        :return: the number of graphs recorded
+        :rtype: int
+        """
+        session = get_session()
+        with session.begin(subtransactions=True):
+            graph_ids = [graph_ref.id for graph_ref in session.query(GraphModel.id)
+                         .filter(GraphModel.end_points_recorded == False)
+                         .order_by(GraphModel.id)
+                         .limit(batch_size)]
+            for graph_id in graph_ids:
+                Graph._set_end_points(graph_id, Graph.get_service_graph(graph_id))
+            if graph_ids:
+                session.query(GraphModel).filter(GraphModel.id.in_(graph_ids))\
+                    .update({"end_points_recorded": True}, synchronize_session=False)
+            return len(graph_ids)
+
+    @staticmethod
+    def _encode(nffg, payload=None):
+        if payload is None:
+            payload = GraphPayload(nffg, extended=True)
+        return graph_codec.encode(payload, GRAPH_CODEC)
+
+    @staticmethod
+    def get_service_graph_hash(graph_id):
+        """
+        Returns the hash of the content of the service graph, reading only the header of the stored graph
+
+        :return: the hash, or None if the graph has been stored without it
+        :rtype: str
+        """
+        session = get_session()
+        header = session.query(func.substr(GraphModel.service_graph, 1, graph_codec.HEADER_LENGTH))\
+            .filter_by(id=graph_id).scalar()
+        return graph_codec.read_hash(header)
+
+    @staticmethod
+    def get_last_graph_version_of_user(user_id):
+        """
+        Returns, with a single query, the id of the last graph of the active session of the user
+        and the hash of its service graph
+
+        :return: (graph id, hash), where the hash is None if the graph has been stored without it
+        :rtype: tuple
+        :raise SessionNotFound: if the user have not an active session with a graph
+        """
         session = get_session()
-        with session.begin():
-            service_graph = json.dumps(nffg.getDict(extended=True, domain=True))
-            session.query(GraphModel).filter_by(id=graph_id).update({"service_graph": service_graph})
+        last_graph = session.query(GraphModel.id,
+                                   func.substr(GraphModel.service_graph, 1, graph_codec.HEADER_LENGTH))\
+            .join(SessionModel, SessionModel.id == GraphModel.session_id)\
+            .filter(SessionModel.user_id == user_id)\
+            .filter(SessionModel.ended == None)\
+            .filter(SessionModel.error == None)\
+            .order_by(GraphModel.id.desc())\
+            .first()
+        if last_graph is None:
+            raise SessionNotFound("Session Not Found")
+        return last_graph[0], graph_codec.read_hash(last_graph[1])
+
+    @staticmethod
+    def get_service_graph(graph_id):
+        """
+        Returns the service graph. The stored graph is fetched and decoded only if it is not already in memory.
+
+        :return: a private copy of the graph
+        :rtype: NF_FG
+        """
+        graph_hash = Graph.get_service_graph_hash(graph_id)
+        nffg = decoded_graphs.get(graph_hash) if graph_hash is not None else None
+        if nffg is None:
+            session = get_session()
+            service_graph = session.query(GraphModel.service_graph).filter_by(id=graph_id).scalar()
+            nffg = NF_FG()
+            nffg.parseDict(graph_codec.decode(service_graph))
+            if graph_hash is not None:
+                decoded_graphs.put(graph_hash, nffg)
+        return clone(nffg)
+
+    @staticmethod
+    def get_last_service_graph(session_id):
+        """
+        Returns the service graph last stored for the session (see get_service_graph)
+
+        :rtype: NF_FG
+        """
+        return Graph.get_service_graph(Graph.get_last_graph(session_id).id)
     
     @staticmethod
     def delete_graph(graph_id):
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
+            session.query(GraphEndPointModel).filter_by(graph_id=graph_id).delete(synchronize_session=False)
             session.query(GraphModel).filter_by(id=graph_id).delete()
-                
-    @staticmethod
-    def _get_higher_graph_id():
-        session = get_session()  
-        return session.query(func.max(GraphModel.id).label("max_id")).one().max_id
 
     @staticmethod
     def get_graphs(session_id):
@@ -100,25 +247,9 @@ class Graph(object):
     @staticmethod
     def set_domain_id(graph_id, domain_id):
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(GraphModel).filter_by(id=graph_id).update({"domain_id": domain_id})
             
-    def id_generator(self, session_id, update=False, graph_id=None):
-        graph_base_id = self._get_higher_graph_id()
-        if graph_base_id is not None:
-            self.graph_id = int(graph_base_id) + 1
-        else:
-            self.graph_id = 0
-        if not update:
-            db_id = self.graph_id
-        else:
-            session = get_session()  
-            if graph_id is None:
-                graphs_ref = session.query(GraphModel).filter_by(session_id=session_id).all()
-                db_id = graphs_ref[0].id
-            else:
-                db_id = graph_id
-        return db_id
     """
     def _getGraph(self, graph_id):
         session = get_session()  
@@ -3,10 +3,11 @@ Created on Oct 1, 2014
 
 @author: fabiomignini
 '''
-from sqlalchemy import Column, DateTime, func, VARCHAR, Text, not_, desc
+from sqlalchemy import Column, DateTime, func, VARCHAR, Text, not_, desc, case
 from service_layer_application_core.sql.sql_server import get_session
 from sqlalchemy.ext.declarative import declarative_base
 from service_layer_application_core.exception import SessionNotFound
+from service_layer_application_core.common.status_notifier import status_notifier
 
 
 import datetime
@@ -54,26 +55,42 @@ class Session(object):
         initialize the session in db
         """
         session = get_session()  
-        with session.begin():
+        with session.begin(subtransactions=True):
             session_ref = SessionModel(id=session_id, user_id=user_id, service_graph_id=service_graph_id,
                                        started_at=datetime.datetime.now(), service_graph_name=service_graph_name,
                                        last_update=datetime.datetime.now(), status='inizialization')
             session.add(session_ref)
-        pass
+        status_notifier.notify(user_id, session_id)
 
     def updateStatus(self, session_id, status, ended=True):
         session = get_session()  
-        with session.begin():
+        with session.begin(subtransactions=True):
             res = session.query(SessionModel)\
                 .filter_by(id=session_id)\
                 .filter_by(error=None)
             if not ended:
                 res = res.filter_by(ended=None)
             res.update({"last_update":datetime.datetime.now(), 'status': status})
+        status_notifier.notify(session_id)
+
+    def restore_status(self, session_id, status, previous_status):
+        """
+        Sets back the previous status of the session, if it still has the given one (i.e. it has not been
+        updated since)
+        """
+        session = get_session()
+        with session.begin(subtransactions=True):
+            updated = session.query(SessionModel)\
+                .filter_by(id=session_id)\
+                .filter_by(status=status)\
+                .update({"last_update": datetime.datetime.now(), 'status': previous_status},
+                        synchronize_session=False)
+        if updated:
+            status_notifier.notify(session_id)
 
     def updateUserID(self, session_id, user_id):
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(SessionModel)\
                 .filter_by(id=session_id)\
                 .filter_by(ended=None)\
@@ -85,7 +102,7 @@ class Session(object):
         store the session in db
         """
         session = get_session()  
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(SessionModel).filter_by(id = session_id).filter_by(ended = None).filter_by(error = None).update({"last_update":datetime.datetime.now(), "ingress_node":ingress_node, "egress_node": egress_node})
     
     def updateSession(self, session_id, ingress_node, egress_node, status):
@@ -93,13 +110,13 @@ class Session(object):
         store the session in db
         """
         session = get_session()  
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(SessionModel).filter_by(id = session_id).filter_by(ended = None).filter_by(error = None).update({"last_update":datetime.datetime.now(), "ingress_node":ingress_node, "egress_node": egress_node, 'status':status})
                 
     '''   
     def update_session(self, service_graph_id, profile, infrastructure):
         session = get_session()  
-        with session.begin():
+        with session.begin(subtransactions=True):
             session.query(SessionModel).filter_by(service_graph_id = service_graph_id).filter_by(ended = None).filter_by(error = None).update({"last_update":datetime.datetime.now()})
     '''
             
@@ -147,14 +164,16 @@ class Session(object):
         if mac_address is None:
             return 1, user_session
         else:
-            # search for the specified device in this session
+            # search for the specified device in this session, counting the devices in the same query
             logging.debug("MAC address: " + str(mac_address))
-            devices = session.query(UserDeviceModel).filter_by(session_id=user_session.id).all()
-            for device in devices:
-                logging.debug("device MAC address:"+str(device.mac_address)+" MAC address:"+str(mac_address))
-                if device.mac_address == mac_address:
-                    return len(devices), user_session
-            raise SessionNotFound("Device not found in the user session")
+            num_devices, device_found = session.query(
+                func.count(UserDeviceModel.mac_address),
+                func.sum(case([(UserDeviceModel.mac_address == mac_address, 1)], else_=0)))\
+                .filter_by(session_id=user_session.id)\
+                .one()
+            if not device_found:
+                raise SessionNotFound("Device not found in the user session")
+            return num_devices, user_session
 
     def get_user_device(self, user_id, mac_address):
         """
@@ -198,28 +217,31 @@ class Session(object):
         Set the ended status for the session identified with session_id
         """
         session = get_session() 
-        with session.begin():       
+        with session.begin(subtransactions=True):       
             session.query(SessionModel)\
                 .filter_by(id=session_id)\
                 .update({"ended": datetime.datetime.now()}, synchronize_session=False)
+        status_notifier.notify(session_id)
     
     def set_error_by_nffg_id(self, nffg_id):
         """
         Set the error status for the active session associated to the nffg id passed
         """
         session = get_session()
-        with session.begin():     
+        with session.begin(subtransactions=True):     
             logging.debug("Put session for nffg "+str(nffg_id)+" in error")
             session.query(SessionModel).filter_by(service_graph_id=nffg_id).filter_by(ended = None).filter_by(error = None).update({"error":datetime.datetime.now()}, synchronize_session = False)
+        status_notifier.notify(nffg_id)
         
     def set_error(self, session_id):
         """
         Set the error status for the active session associated to the user id passed
         """
         session = get_session()
-        with session.begin():
+        with session.begin(subtransactions=True):
             logging.debug("Put session for session "+str(session_id)+" in error")
             session.query(SessionModel).filter_by(id=session_id).filter_by(ended = None).filter_by(error = None).update({"error":datetime.datetime.now()}, synchronize_session = False)
+        status_notifier.notify(session_id)
     
     def checkSession(self, user_id):
         """
@@ -237,21 +259,19 @@ class Session(object):
         return true if there is already an active session of the user with this mac
         """
         session = get_session()
-        user_sessions = session.query(SessionModel)\
-            .filter_by(user_id=user_id)\
-            .filter_by(ended=None)\
-            .filter_by(error=None).all()
-        for user_session in user_sessions:
-            devices = session.query(UserDeviceModel).filter_by(session_id=user_session.id).all()
-            for device in devices:
-                if device.mac_address == mac_address:
-                    return True
-        return False
+        device = session.query(UserDeviceModel.mac_address)\
+            .join(SessionModel, SessionModel.id == UserDeviceModel.session_id)\
+            .filter(SessionModel.user_id == user_id)\
+            .filter(SessionModel.ended == None)\
+            .filter(SessionModel.error == None)\
+            .filter(UserDeviceModel.mac_address == mac_address)\
+            .first()
+        return device is not None
         
     @staticmethod
     def add_device_in_the_session(mac_address, endpoint_id, endpoint_db_id, session_id):
         session = get_session()
-        with session.begin():     
+        with session.begin(subtransactions=True):     
             user_device_ref = UserDeviceModel(
                 session_id=session_id,
                 mac_address=mac_address,
@@ -263,17 +283,12 @@ class Session(object):
     @staticmethod
     def get_active_user_devices(user_id):
         session = get_session()
-        user_sessions = session.query(SessionModel.id)\
-            .filter_by(user_id=user_id)\
-            .filter_by(ended=None)\
-            .filter_by(error=None)\
+        return session.query(UserDeviceModel)\
+            .join(SessionModel, SessionModel.id == UserDeviceModel.session_id)\
+            .filter(SessionModel.user_id == user_id)\
+            .filter(SessionModel.ended == None)\
+            .filter(SessionModel.error == None)\
             .all()
-        user_devices = []
-        for user_session in user_sessions:
-            devices = session.query(UserDeviceModel).filter_by(session_id=user_session.id).all()
-            for device in devices:
-                user_devices.append(device)
-        return user_devices
 
     def get_active_user_devices_for_endpoint(self, user_id, endpoint_id):
         """
@@ -297,12 +312,29 @@ class Session(object):
             .all()
         return user_devices
 
+    @staticmethod
+    def get_user_session_status(user_id):
+        """
+        Returns the status of the last session of the user not yet ended, including the sessions in error.
+        Only columns are read, so that the status is read again from the database at each call.
+
+        :return: the id, the service graph id, the status, the error time and the last update of the session,
+                 or None if the user have not a session
+        :rtype: tuple
+        """
+        session = get_session()
+        return session.query(SessionModel.id, SessionModel.service_graph_id, SessionModel.status,
+                             SessionModel.error, SessionModel.last_update)\
+            .filter_by(user_id=user_id)\
+            .filter_by(ended=None)\
+            .order_by(desc(SessionModel.started_at))\
+            .first()
+
     def get_active_user_session_from_id(self, session_id):
         session = get_session()
-        with session.begin():  
-            user_session = session.query(SessionModel).filter_by(id=session_id).filter_by(ended = None).filter_by(error = None).first()
-            if not user_session:
-                raise SessionNotFound("Session Not Found") 
+        user_session = session.query(SessionModel).filter_by(id=session_id).filter_by(ended = None).filter_by(error = None).first()
+        if not user_session:
+            raise SessionNotFound("Session Not Found")
         return user_session
     
     def get_active_user_session_by_nf_fg_id(self, service_graph_id, error_aware=True):
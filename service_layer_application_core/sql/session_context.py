@@ -0,0 +1,107 @@
+"""
+Created on Oct 18, 2026
+
+Active session of a user, along with its last graph and its devices, loaded with a single query.
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Bundle
+
+from service_layer_application_core.sql.sql_server import get_session
+from service_layer_application_core.sql.session import SessionModel, UserDeviceModel
+from service_layer_application_core.sql.graph import GraphModel
+from service_layer_application_core.exception import SessionNotFound
+
+
+class SessionContext(object):
+    """
+    Snapshot of the active session of a user, meant to be loaded once per request and reused for all the
+    checks of the request in place of a query each.
+    It is not updated by the changes made during the request.
+    """
+
+    def __init__(self, user_id, session=None, last_graph=None, devices=()):
+        """
+
+        :param user_id: the id of the user in database
+        :param session: the active session of the user, if any
+        :param last_graph: the last graph of the session, without its service graph, if any
+        :param devices: the devices of the session
+        :type session: SessionModel
+        :type last_graph: Bundle row
+        :type devices: list of UserDeviceModel
+        """
+        self.user_id = user_id
+        self.session = session
+        self.last_graph = last_graph
+        self.devices = list(devices)
+        self._devices_by_mac = {device.mac_address: device for device in self.devices}
+
+    @staticmethod
+    def load(user_id, error_aware=True):
+        """
+        Loads the active session of the user, with its last graph and its devices
+
+        :param user_id: the id of the user in database
+        :param error_aware: if passed as "False", include also sessions that have "error" column setted
+        :rtype: SessionContext
+        """
+        session = get_session()
+        last_graph_id = session.query(func.max(GraphModel.id))\
+            .filter(GraphModel.session_id == SessionModel.id)\
+            .correlate(SessionModel)\
+            .as_scalar()
+        # the service graph is not fetched, readers get it by id (usually from memory)
+        graph = Bundle('graph', GraphModel.id, GraphModel.domain_id, GraphModel.partial,
+                       GraphModel.deployed_version)
+        query = session.query(SessionModel, graph, UserDeviceModel)\
+            .outerjoin(GraphModel, GraphModel.id == last_graph_id)\
+            .outerjoin(UserDeviceModel, UserDeviceModel.session_id == SessionModel.id)\
+            .filter(SessionModel.user_id == user_id)\
+            .filter(SessionModel.ended == None)
+        if error_aware is True:
+            query = query.filter(SessionModel.error == None)
+        rows = query.all()
+        if not rows:
+            return SessionContext(user_id)
+        # like get_active_user_session, the first active session found is the one considered
+        user_session, last_graph, _ = rows[0]
+        devices = [device for row_session, _, device in rows
+                   if row_session is user_session and device is not None]
+        return SessionContext(user_id, user_session, last_graph if last_graph.id is not None else None, devices)
+
+    def is_active(self):
+        """
+        return true if there is an active session of the user
+        """
+        return self.session is not None
+
+    def get_session(self):
+        """
+        :rtype: SessionModel
+        :raise SessionNotFound: if the user have not an active session
+        """
+        if self.session is None:
+            raise SessionNotFound("Session Not Found")
+        return self.session
+
+    def has_device(self, mac_address):
+        """
+        return true if the device is in the active session of the user
+        """
+        return mac_address in self._devices_by_mac
+
+    def get_device(self, mac_address):
+        """
+        :rtype: UserDeviceModel
+        :raise SessionNotFound: if the device is not in the active session of the user
+        """
+        device = self._devices_by_mac.get(mac_address)
+        if device is None:
+            raise SessionNotFound("Device not found in the user session")
+        return device
+
+    def get_devices_for_endpoint(self, endpoint_id):
+        """
+        :rtype: list of UserDeviceModel
+        """
+        return [device for device in self.devices if device.endpoint_id == endpoint_id]
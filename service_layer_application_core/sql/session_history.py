@@ -0,0 +1,105 @@
+"""
+Created on Oct 18, 2026
+
+History of the ended sessions: the sessions and their graphs are moved here from the tables
+used by the active sessions, so that these stay proportional to the connected users.
+"""
+import datetime
+
+from sqlalchemy import Column, DateTime, VARCHAR, Text, Integer, Boolean, select, literal
+from sqlalchemy.ext.declarative import declarative_base
+
+from service_layer_application_core.sql.sql_server import get_session
+from service_layer_application_core.sql.session import SessionModel, UserDeviceModel
+from service_layer_application_core.sql.graph import GraphModel, GraphEndPointModel
+
+Base = declarative_base()
+
+
+class SessionHistoryModel(Base):
+    """
+    Maps the database table session_history
+    """
+    __tablename__ = 'session_history'
+    attributes = ['id', 'user_id', 'service_graph_id', 'service_graph_name', 'ingress_node', 'egress_node', 'status',
+                  'started_at', 'last_update', 'error', 'ended', 'archived_at']
+    id = Column(VARCHAR(64), primary_key=True)
+    user_id = Column(VARCHAR(64))
+    service_graph_id = Column(Text)
+    service_graph_name = Column(Text)
+    ingress_node = Column(Text)
+    egress_node = Column(Text)
+    status = Column(Text)
+    started_at = Column(Text)
+    last_update = Column(DateTime)
+    error = Column(DateTime)
+    ended = Column(DateTime)
+    archived_at = Column(DateTime)
+
+
+class GraphHistoryModel(Base):
+    """
+    Maps the database table graph_history
+    """
+    __tablename__ = 'graph_history'
+    attributes = ['id', 'session_id', 'domain_id', 'partial', 'service_graph', 'deployed_version', 'archived_at']
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(VARCHAR(64))
+    domain_id = Column(Integer)
+    partial = Column(Boolean())
+    service_graph = Column(Text)
+    deployed_version = Column(VARCHAR(64))
+    archived_at = Column(DateTime)
+
+
+class SessionHistory(object):
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def archive_ended_sessions(ended_before, batch_size):
+        """
+        Moves to the history tables, in a single transaction, a batch of the sessions ended before the given
+        time along with their graphs, deleting their devices
+
+        :param ended_before: only sessions ended before this time are archived
+        :param batch_size: maximum number of sessions archived
+        :type ended_before: datetime.datetime
+        :type batch_size: int
+        :return: the number of sessions archived
+        :rtype: int
+        """
+        session = get_session()
+        with session.begin(subtransactions=True):
+            session_ids = [session_ref.id for session_ref in session.query(SessionModel.id)
+                           .filter(SessionModel.ended != None)
+                           .filter(SessionModel.ended < ended_before)
+                           .order_by(SessionModel.ended)
+                           .limit(batch_size)]
+            if not session_ids:
+                return 0
+            archived_at = datetime.datetime.now()
+            session.execute(SessionHistoryModel.__table__.insert().from_select(
+                SessionHistoryModel.attributes,
+                select([getattr(SessionModel, name) for name in SessionModel.attributes] + [literal(archived_at)])
+                .where(SessionModel.id.in_(session_ids))))
+            session.execute(GraphHistoryModel.__table__.insert().from_select(
+                GraphHistoryModel.attributes,
+                select([getattr(GraphModel, name) for name in GraphModel.attributes] + [literal(archived_at)])
+                .where(GraphModel.session_id.in_(session_ids))))
+            session.query(UserDeviceModel)\
+                .filter(UserDeviceModel.session_id.in_(session_ids))\
+                .delete(synchronize_session=False)
+            graph_ids = [graph_ref.id for graph_ref in session.query(GraphModel.id)
+                         .filter(GraphModel.session_id.in_(session_ids))]
+            if graph_ids:
+                session.query(GraphEndPointModel)\
+                    .filter(GraphEndPointModel.graph_id.in_(graph_ids))\
+                    .delete(synchronize_session=False)
+            session.query(GraphModel)\
+                .filter(GraphModel.session_id.in_(session_ids))\
+                .delete(synchronize_session=False)
+            session.query(SessionModel)\
+                .filter(SessionModel.id.in_(session_ids))\
+                .delete(synchronize_session=False)
+            return len(session_ids)
@@ -3,17 +3,260 @@ Created on Jun 22, 2015
 
 @author: fabiomignini
 """
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
 import sqlalchemy
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 from service_layer_application_core.config import Configuration
+from service_layer_application_core import metrics
 
 sqlserver = Configuration().DB_CONNECTION
 
-def create_session():
-    engine = sqlalchemy.create_engine(sqlserver)  # connect to server
-    session = sessionmaker()
-    session.configure(bind=engine,autocommit=True)
-    return session()
+
+class PoolMetrics(object):
+    """
+    Counters about the usage of the connection pool of this process
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+
+    def on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+
+    def on_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def on_wait(self, seconds):
+        with self._lock:
+            self.wait_time += seconds
+            if seconds > self.max_wait_time:
+                self.max_wait_time = seconds
+
+    def getDict(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'timeouts': self.timeouts,
+                'wait_time': self.wait_time,
+                'max_wait_time': self.max_wait_time,
+                'avg_wait_time': self.wait_time / self.checkouts if self.checkouts else 0.0
+            }
+
+pool_metrics = PoolMetrics()
+
+
+class QueryProfiler(object):
+    """
+    Measures the statements executed by the engine, logging the ones slower than the threshold
+    along with their query plan, and keeps counters about the slow statements of this process
+    """
+
+    # statements whose plan can be explained
+    _EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+    def __init__(self, threshold, explain=True, max_statements=100):
+        """
+
+        :param threshold: seconds after which a statement is considered slow
+        :param explain: if True, the plan of the slow statements is logged
+        :param max_statements: maximum number of distinct slow statements whose counters are kept
+        :type threshold: float
+        :type explain: bool
+        :type max_statements: int
+        """
+        self.threshold = threshold
+        self.explain = explain
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.slow_statements = 0
+        # fingerprint of the statement -> [count, total time, max time]
+        self._slow = {}
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start_time'] = time.time()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.time() - conn.info['query_start_time']
+        with self._lock:
+            self.statements += 1
+            if elapsed < self.threshold:
+                return
+            self.slow_statements += 1
+            fingerprint = self.fingerprint(statement)
+            stats = self._slow.get(fingerprint)
+            if stats is None and len(self._slow) < self.max_statements:
+                stats = self._slow[fingerprint] = [0, 0.0, 0.0]
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+        message = "Slow query %s (%.3f s): %s; parameters: %s" % (fingerprint, elapsed, statement, parameters)
+        if self.explain and not executemany:
+            message += "\n" + self._explain(conn, statement, parameters)
+        logging.warning(message)
+
+    @staticmethod
+    def fingerprint(statement):
+        """
+        Identifies a statement in the metrics without exposing its text, that is only logged
+
+        :rtype: str
+        """
+        return hashlib.sha1(statement.encode('utf-8')).hexdigest()[:12]
+
+    @classmethod
+    def _explain(cls, conn, statement, parameters):
+        if not statement.lstrip().upper().startswith(cls._EXPLAINABLE):
+            return "(no query plan available)"
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        try:
+            # the plan is read with a separate cursor, the one of the statement may still hold its results
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                columns = [column[0] for column in cursor.description]
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as ex:
+            return "(query plan not available: " + str(ex) + ")"
+        return "\n".join([" | ".join(columns)] + [" | ".join(str(value) for value in row) for row in rows])
+
+    def getDict(self):
+        with self._lock:
+            slow = sorted(self._slow.items(), key=lambda item: item[1][1], reverse=True)
+            return {
+                'threshold': self.threshold,
+                'statements': self.statements,
+                'slow_statements': self.slow_statements,
+                'slowest': [{'fingerprint': fingerprint, 'count': count, 'total_time': total_time,
+                             'max_time': max_time} for fingerprint, (count, total_time, max_time) in slow[:10]]
+            }
+
+query_profiler = None
+if Configuration().DB_SLOW_QUERY_THRESHOLD > 0:
+    query_profiler = QueryProfiler(Configuration().DB_SLOW_QUERY_THRESHOLD, Configuration().DB_EXPLAIN_SLOW_QUERIES)
+    metrics.register('db_slow_queries', query_profiler.getDict)
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that measures how long each checkout waits for a free connection
+    """
+    def _do_get(self):
+        start = time.time()
+        try:
+            return super(MeteredQueuePool, self)._do_get()
+        except PoolTimeoutError:
+            pool_metrics.on_timeout()
+            raise
+        finally:
+            pool_metrics.on_wait(time.time() - start)
+
+
+# sessions are scoped to the current thread (i.e. to the request served by it) and must be
+# released through remove_session() when the request is completed
+_scoped_session = scoped_session(sessionmaker(autocommit=True, expire_on_commit=False))
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the engine of this process, creating it at the first call.
+    A new engine is created after a fork, since pooled connections can not be shared among processes.
+    """
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        with _engine_lock:
+            if _engine is None or _engine_pid != os.getpid():
+                conf = Configuration()
+                engine = sqlalchemy.create_engine(sqlserver,
+                                                  poolclass=MeteredQueuePool,
+                                                  pool_size=conf.DB_POOL_SIZE,
+                                                  max_overflow=conf.DB_MAX_OVERFLOW,
+                                                  pool_timeout=conf.DB_POOL_TIMEOUT,
+                                                  pool_recycle=conf.DB_POOL_RECYCLE,
+                                                  pool_pre_ping=conf.DB_POOL_PRE_PING)
+                event.listen(engine, 'connect', pool_metrics.on_connect)
+                event.listen(engine, 'checkout', pool_metrics.on_checkout)
+                event.listen(engine, 'checkin', pool_metrics.on_checkin)
+                if query_profiler is not None:
+                    event.listen(engine, 'before_cursor_execute', query_profiler.before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', query_profiler.after_cursor_execute)
+                _scoped_session.remove()
+                _scoped_session.configure(bind=engine)
+                _engine = engine
+                _engine_pid = os.getpid()
+    return _engine
+
 
 def get_session():
-    return create_session()
\ No newline at end of file
+    """
+    Returns the session of the current request
+    """
+    get_engine()
+    return _scoped_session()
+
+
+@contextmanager
+def transaction():
+    """
+    Groups the db writes performed in its block by the sql classes in a single transaction of the
+    session of the current request: they are committed together at the end of the block, or all
+    rolled back if an exception is raised. Transactions begun inside the block are joined to this one.
+    """
+    session = get_session()
+    with session.begin(subtransactions=True):
+        yield session
+
+
+def remove_session():
+    """
+    Closes the session of the current request, giving back its connection to the pool
+    """
+    _scoped_session.remove()
+
+
+def get_pool_status():
+    """
+    Returns the status of the connection pool of this process and the counters about its usage
+    """
+    status = pool_metrics.getDict()
+    if _engine is not None:
+        status['size'] = _engine.pool.size()
+        status['checked_in'] = _engine.pool.checkedin()
+        status['checked_out'] = _engine.pool.checkedout()
+        status['overflow'] = _engine.pool.overflow()
+    return status
+
+metrics.register('db_pool', get_pool_status)
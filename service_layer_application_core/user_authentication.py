@@ -4,18 +4,54 @@ Created on 18 set 2015
 @author: Andrea
 '''
 
+import hashlib
+import hmac
+import logging
+import os
+
 from .sql.user import User
+from service_layer_application_core.config import Configuration
+from service_layer_application_core.common.cache import LRUCache
 from service_layer_application_core.exception import UnauthorizedRequest
+from service_layer_application_core import metrics
+
+# users recently authenticated, keyed by username, as (credentials digest, user id, tenant id)
+identity_cache = LRUCache(Configuration().AUTH_CACHE_SIZE, ttl=Configuration().AUTH_CACHE_TTL)
+metrics.register('auth_cache', identity_cache.getDict)
+# the digests are salted with a secret of this process, so they are useless outside of it
+_CREDENTIALS_SALT = os.urandom(32)
+
+
+def _credentials_digest(username, password, tenant):
+    credentials = '\x00'.join((username, tenant, password)).encode('utf-8')
+    return hmac.new(_CREDENTIALS_SALT, credentials, hashlib.sha256).digest()
+
+
+def invalidate_user(username=None):
+    """
+    Forgets the cached authentication of a user, or of all the users if no one is specified
+    """
+    if username:
+        identity_cache.invalidate(username)
+        logging.debug("Cached authentication of user '" + username + "' removed")
+    else:
+        identity_cache.clear()
+        logging.debug("Authentication cache cleared")
+
 
 class UserData(object):
     
-    def __init__(self, usr, pwd, tnt):
+    def __init__(self, usr, pwd, tnt, user_id=None, tenant_id=None):
         self.username = usr
         self.password = pwd
         self.tenant = tnt
+        self.user_id = user_id
+        self.tenant_id = tenant_id
     
     def getUserID(self):
-        return User().getUser(self.username).id
+        if self.user_id is None:
+            self.user_id = User().getUser(self.username).id
+        return self.user_id
 
 class UserAuthentication(object):
     
@@ -30,11 +66,17 @@ class UserAuthentication(object):
     def authenticateUserFromCredentials(self, username, password, tenant):
         if username is None or password is None or tenant is None:
             raise UnauthorizedRequest('Authentication credentials required')
+
+        digest = _credentials_digest(username, password, tenant)
+        identity = identity_cache.get(username)
+        if identity is not None and hmac.compare_digest(identity[0], digest):
+            return UserData(username, password, tenant, user_id=identity[1], tenant_id=identity[2])
         
         user = User().getUser(username)
         if user.password == password:
             tenantName = User().getTenantName(user.tenant_id)
             if tenantName == tenant:
-                userobj = UserData(username, password, tenant)
+                identity_cache.put(username, (digest, user.id, user.tenant_id))
+                userobj = UserData(username, password, tenant, user_id=user.id, tenant_id=user.tenant_id)
                 return userobj
         raise UnauthorizedRequest('Invalid authentication credentials')